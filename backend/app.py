@@ -1,9 +1,14 @@
 import os
 import uuid
+import struct
 import soundfile as sf
+import numpy as np
+import librosa
 import json
-import time
+import queue
 import threading
+import time
+import zipfile
 from flask import (
     Flask,
     request,
@@ -15,17 +20,45 @@ from flask import (
 )
 from flask_cors import CORS
 from pathlib import Path
+from typing import Optional
 
 from model_manager import ModelManager
 from personality_manager import PersonalityManager
 from chimera_maker import ChimeraMaker
+from progress import ChannelRegistry, ProgressChannel
+from scheduler import MAX_BATCH_SIZE, JobScheduler
+from output_cache import OutputCache
+from longform import LongFormRunner
+from warmup import WarmupManager
+
+# Numero massimo di item per richiesta a /api/generate_batch
+BATCH_MAX_ITEMS = int(os.environ.get("QWENTTS_BATCH_MAX_ITEMS", "256"))
+# Chunk sintetizzati in anticipo rispetto al client in /api/generate_audio_stream
+STREAM_QUEUE_CHUNKS = int(os.environ.get("QWENTTS_STREAM_QUEUE_CHUNKS", "4"))
+# Attesa massima (secondi) di un client che non legge lo stream prima di
+# interrompere la generazione e liberare il worker
+STREAM_CLIENT_TIMEOUT = float(os.environ.get("QWENTTS_STREAM_CLIENT_TIMEOUT", "30"))
 
 app = Flask(__name__, static_folder="../frontend")
 CORS(app)
 
 manager = ModelManager()
+# Unico worker che esegue tutti i job sui modelli TTS
+scheduler = JobScheduler(manager)
 OUTPUT_DIR = Path(__file__).parent.parent / "output"
 OUTPUT_DIR.mkdir(exist_ok=True)
+# Cache content-addressed dell'audio generato (stessa directory servita da /api/audio)
+output_cache = OutputCache(OUTPUT_DIR)
+# Generazioni in corso per fingerprint: le richieste duplicate condividono il job
+inflight_jobs = ChannelRegistry()
+# Job long-form a chunk con checkpoint per la ripresa dopo un crash
+longform_runner = LongFormRunner(
+    OUTPUT_DIR / "longform", OUTPUT_DIR, scheduler, output_cache
+)
+
+# Preload e warmup dei modelli configurati (QWENTTS_PRELOAD) prima di servire traffico
+warmup = WarmupManager(manager, scheduler)
+warmup.start()
 
 PERSONALITIES_DIR = Path(__file__).parent.parent / "saved_personalities"
 PERSONALITIES_DIR.mkdir(exist_ok=True)
@@ -45,13 +78,25 @@ def static_files(path):
 
 @app.route("/api/status", methods=["GET"])
 def get_status():
-    """Ritorna quale modello è attualmente caricato"""
-    return jsonify(manager.get_status())
+    """
+    Ritorna quale modello è attualmente caricato e lo stato della coda.
+    Finché il warmup non è concluso risponde 503 (ready: false), così i
+    load balancer non instradano traffico verso un worker freddo. Un warmup
+    fallito risponde 200 con degraded: true e gli errori in warmup.results.
+    """
+    status = manager.get_status()
+    status["scheduler"] = scheduler.get_status()
+    status["output_cache"] = output_cache.stats()
+    status["in_flight"] = inflight_jobs.stats()
+    status["ready"] = warmup.ready
+    status["degraded"] = warmup.degraded
+    status["warmup"] = warmup.get_status()
+    return jsonify(status), 200 if warmup.ready else 503
 
 
 @app.route("/api/switch_model", methods=["POST"])
 def switch_model():
-    """Cambia modello attivo (con hot-swap della VRAM)"""
+    """Cambia modello attivo (riattivandolo dal pool se già residente)"""
     data = request.json
     model_type = data.get("model_type")
 
@@ -59,7 +104,8 @@ def switch_model():
         return jsonify({"error": "Tipo modello non valido"}), 400
 
     try:
-        manager.load_model(model_type)
+        # Lo switch passa dalla coda: non interrompe una generazione in corso
+        scheduler.submit(model_type, lambda m: True).result()
         return jsonify(
             {
                 "success": True,
@@ -74,214 +120,631 @@ def switch_model():
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
 
 
-@app.route("/api/generate_stream", methods=["POST"])
-def generate_stream():
-    """Genera audio TTS con progresso streaming tramite SSE"""
-    data = request.json
-    expected_model = data.get("expected_model")
-    audio_format = data.get("format", "wav").lower()
+def attach_personality_config(data: dict):
+    """Carica la config della personalità richiesta e la aggiunge ai params"""
+    personality_name = data.get("personality_name")
+    if not personality_name:
+        return
 
-    # Il controllo del modello viene fatto nel thread di generazione per gestire lo switch automatico
-    pass
+    personality_config = personality_manager.get_details(personality_name)
+    if personality_config is None:
+        raise ValueError(f"Personalità '{personality_name}' non trovata")
 
-    def generate_with_progress():
-        """Generatore per SSE con aggiornamenti progresso REALI"""
+    # Aggiungi il base_dir alla config per trovare i file audio
+    personality_config["_base_dir"] = str(
+        PERSONALITIES_DIR / personality_manager._sanitize_name(personality_name)
+    )
 
-        # Stato condiviso tra thread
-        progress_state = {
-            "progress": 0,
-            "stage": "Inizializzazione...",
-            "eta": 0,
-            "done": False,
-            "error": None,
-            "audio_url": None,
-        }
+    # Aggiungi config ai params
+    data["personality_config"] = personality_config
 
-        def generation_thread():
-            """Thread che esegue la generazione effettiva"""
-            try:
-                # Stima durata basata sulla lunghezza del testo
-                text_length = len(data.get("text", ""))
-                estimated_seconds = max(5, text_length * 0.1)
 
-                progress_state["stage"] = "Preparazione modello..."
-                progress_state["eta"] = int(estimated_seconds)
+def sse_response(channel: ProgressChannel, *extra_fields: str) -> Response:
+    """
+    Risposta SSE di generazione: lo stream resta bloccato sul canale e ogni
+    evento viene inviato appena pubblicato. extra_fields si aggiungono ai
+    campi inoltrati negli eventi intermedi (es. job_id per il long-form).
+    """
+    return Response(
+        stream_with_context(
+            channel.sse(
+                "progress",
+                "stage",
+                "eta",
+                "tokens_per_sec",
+                "audio_seconds",
+                *extra_fields,
+            )
+        ),
+        mimetype="text/event-stream",
+    )
 
-                # Check e switch modello se necessario
-                if manager.current_model_type != expected_model:
-                    progress_state["stage"] = f"Switch modello: {expected_model}..."
-                    manager.load_model(expected_model)
 
-                time.sleep(0.5)
+def run_generation_batch(model_manager, payloads: list) -> list:
+    """
+    Esegue sul worker uno o più job di generazione compatibili.
+    La callback di progresso del batch viene inoltrata a tutte le richieste.
+    """
+    callbacks = [payload["progress_callback"] for payload in payloads]
 
-                # Se c'è un personality_name, carica la config
-                personality_name = data.get("personality_name")
-                if personality_name:
-                    progress_state["stage"] = (
-                        f"Caricamento personalità '{personality_name}'..."
-                    )
-                    personality_config = personality_manager.get_details(
-                        personality_name
-                    )
-                    if personality_config is None:
-                        raise ValueError(
-                            f"Personalità '{personality_name}' non trovata"
-                        )
+    def fan_out(info: dict):
+        for callback in callbacks:
+            callback(info)
 
-                    # Aggiungi il base_dir alla config per trovare i file audio
-                    personality_config["_base_dir"] = str(
-                        PERSONALITIES_DIR
-                        / personality_manager._sanitize_name(personality_name)
-                    )
+    return model_manager.generate_batch(
+        [payload["params"] for payload in payloads], progress_callback=fan_out
+    )
 
-                    # Aggiungi config ai params
-                    data["personality_config"] = personality_config
 
-                # Fase 2: Tokenizzazione (20%)
-                progress_state["progress"] = 20
-                progress_state["stage"] = "Tokenizzazione in corso..."
-                progress_state["eta"] = int(estimated_seconds * 0.8)
-                time.sleep(0.3)
+def render_output(wav, sr: int, audio_format: str, fingerprint: Optional[str]) -> str:
+    """
+    Salva l'audio generato (convertendolo in MP3 se richiesto) e, se c'è un
+    fingerprint, lo registra nella cache di output. Ritorna il nome del file
+    da servire via /api/audio.
+    """
+    wav_path = OUTPUT_DIR / f"{uuid.uuid4().hex}.wav"
+    sf.write(str(wav_path), wav, sr)
+    return output_cache.publish(wav_path, audio_format, fingerprint)
+
+
+def wav_stream_header(sample_rate: int, channels: int = 1) -> bytes:
+    """Header WAV PCM 16-bit con lunghezza indefinita, per lo streaming"""
+    block_align = channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        0xFFFFFFFF,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,  # PCM
+        channels,
+        sample_rate,
+        sample_rate * block_align,
+        block_align,
+        16,
+        b"data",
+        0xFFFFFFFF,
+    )
 
-                # Fase 3: Generazione (25-70% con aggiornamenti progressivi)
-                progress_state["progress"] = 25
-                if personality_name:
-                    progress_state["stage"] = (
-                        f"Generazione multi-segmento (personalità: {personality_name})..."
-                    )
-                else:
-                    progress_state["stage"] = "Generazione audio (inferenza GPU)..."
-                progress_state["eta"] = int(estimated_seconds * 0.75)
-
-                # Avvia generazione effettiva
-                start_time = time.time()
-                result = {"wavs": None, "sr": None, "error": None}
-
-                def actual_generation():
-                    try:
-                        result["wavs"], result["sr"] = manager.generate(data)
-                    except Exception as e:
-                        result["error"] = str(e)
-
-                gen_thread = threading.Thread(target=actual_generation)
-                gen_thread.start()
-
-                # Simula progresso incrementale mentre la generazione è in corso
-                while gen_thread.is_alive():
-                    elapsed = time.time() - start_time
-                    # Progresso stimato: da 25% a 70% in base al tempo trascorso
-                    estimated_progress = min(
-                        70, 25 + int((elapsed / estimated_seconds) * 45)
-                    )
-                    progress_state["progress"] = estimated_progress
-                    remaining = max(1, int(estimated_seconds - elapsed))
-                    progress_state["eta"] = remaining
-                    time.sleep(0.5)  # Aggiorna ogni 500ms
-
-                gen_thread.join()
-
-                if result["error"]:
-                    raise Exception(result["error"])
-
-                wavs, sr = result["wavs"], result["sr"]
-
-                # Fase 4: Post-processing (75%)
-                progress_state["progress"] = 75
-                progress_state["stage"] = "Salvataggio file WAV..."
-                progress_state["eta"] = 2
-                time.sleep(
-                    0.4
-                )  # Permette al loop SSE di catturare questo aggiornamento
-
-                # Salva file
-                base_filename = uuid.uuid4().hex
-                temp_wav_path = OUTPUT_DIR / f"{base_filename}.wav"
-                sf.write(str(temp_wav_path), wavs[0], sr)
-
-                # Fase 5: Conversione (85%)
-                if audio_format == "mp3":
-                    progress_state["progress"] = 85
-                    progress_state["stage"] = "Conversione in MP3..."
-                    progress_state["eta"] = 1
-                    time.sleep(
-                        0.4
-                    )  # Permette al loop SSE di catturare questo aggiornamento
-                    try:
-                        from pydub import AudioSegment
-
-                        mp3_path = OUTPUT_DIR / f"{base_filename}.mp3"
-                        audio = AudioSegment.from_wav(str(temp_wav_path))
-                        audio.export(str(mp3_path), format="mp3", bitrate="192k")
-                        temp_wav_path.unlink()
-                        audio_url = f"/api/audio/{base_filename}.mp3"
-                    except ImportError:
-                        audio_url = f"/api/audio/{base_filename}.wav"
+
+def to_pcm16(wav) -> bytes:
+    """Converte un array float [-1, 1] in frame PCM 16-bit little-endian"""
+    return (np.clip(wav, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+@app.route("/api/generate_audio_stream", methods=["POST"])
+def generate_audio_stream():
+    """
+    Genera audio TTS in streaming incrementale (chunked HTTP).
+
+    Il testo viene diviso in frasi (o segmenti taggati in modalità personalità)
+    sintetizzate in ordine: ogni chunk viene inviato al client appena pronto,
+    quindi il primo audio arriva dopo la prima frase e non a fine documento.
+
+    Input (JSON): stessi parametri di /api/generate_stream, più
+    - format: "wav" (default, WAV 16-bit a lunghezza indefinita) oppure "pcm"
+      (frame PCM 16-bit grezzi; sample rate nell'header X-Sample-Rate)
+    """
+    data = request.json
+    expected_model = data.get("expected_model")
+    stream_format = data.get("format", "wav").lower()
+
+    if stream_format not in ("wav", "pcm"):
+        return jsonify({"error": "Formato streaming non valido"}), 400
+    if expected_model not in ["base", "custom", "design"]:
+        return jsonify({"error": "Tipo modello non valido"}), 400
+
+    try:
+        attach_personality_config(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Il job sul worker produce i chunk in una coda limitata consumata dalla
+    # risposta: se il client è lento il worker si ferma; se si disconnette, o
+    # non legge per più di STREAM_CLIENT_TIMEOUT secondi, la generazione
+    # viene interrotta e il worker torna libero per gli altri job
+    chunks = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+
+    def put_chunk(item) -> bool:
+        """Accoda un chunk; False se il client ha chiuso o non legge più"""
+        deadline = time.time() + STREAM_CLIENT_TIMEOUT
+        while not cancelled.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if time.time() >= deadline:
+                    cancelled.set()
+        return False
+
+    def next_chunk():
+        """Prossimo chunk; None a fine stream o se la generazione è stata interrotta"""
+        while True:
+            try:
+                return chunks.get(timeout=0.5)
+            except queue.Empty:
+                if cancelled.is_set():
+                    return None
+
+    def stream_job(model_manager):
+        try:
+            for wav, sr in model_manager.generate_iter(data):
+                if not put_chunk((wav, sr)):
+                    break
+        except Exception as e:
+            put_chunk(e)
+        finally:
+            put_chunk(None)
+
+    def on_job_done(future):
+        # Job fallito prima di eseguire stream_job (es. caricamento del modello):
+        # nessun chunk arriverà, l'errore sblocca la risposta
+        if future.exception() is not None:
+            put_chunk(future.exception())
+
+    job = scheduler.submit(expected_model, stream_job)
+    job.future.add_done_callback(on_job_done)
+
+    # Attende il primo chunk prima di rispondere: serve il sample rate
+    first = next_chunk()
+    if first is None:
+        return jsonify({"error": "Testo vuoto"}), 400
+    if isinstance(first, Exception):
+        status = 400 if isinstance(first, ValueError) else 500
+        return jsonify({"error": str(first)}), status
+    first_wav, sample_rate = first
+
+    def stream_audio():
+        try:
+            if stream_format == "wav":
+                yield wav_stream_header(sample_rate)
+            yield to_pcm16(first_wav)
+            while True:
+                item = next_chunk()
+                if item is None or isinstance(item, Exception):
+                    # Un errore a stream avviato può solo troncare l'audio
+                    break
+                wav, sr = item
+                if sr != sample_rate:
+                    wav = librosa.resample(wav, orig_sr=sr, target_sr=sample_rate)
+                yield to_pcm16(wav)
+        finally:
+            # Fine normale o client disconnesso (GeneratorExit): il job smette
+            # di sintetizzare le frasi successive
+            cancelled.set()
+
+    mimetype = "audio/wav" if stream_format == "wav" else "audio/L16"
+    response = Response(
+        stream_with_context(stream_audio()),
+        mimetype=mimetype,
+        headers={"X-Sample-Rate": str(sample_rate), "Cache-Control": "no-cache"},
+    )
+    # Anche se la risposta viene chiusa prima di iniziare a iterare
+    response.call_on_close(cancelled.set)
+    return response
+
+
+@app.route("/api/generate_stream", methods=["POST"])
+def generate_stream():
+    """Genera audio TTS con progresso streaming tramite SSE"""
+    data = request.json
+    expected_model = data.get("expected_model")
+    audio_format = data.get("format", "wav").lower()
+
+    # Il fingerprint identifica la richiesta sia per la cache che per il single-flight
+    try:
+        attach_personality_config(data)
+        fingerprint = output_cache.fingerprint(data, audio_format)
+    except Exception as e:
+        channel = ProgressChannel()
+        channel.fail(str(e))
+        return sse_response(channel)
+
+    # Senza seed (o con no_cache) l'audio non è riproducibile: niente cache
+    # su disco, ma le richieste identiche contemporanee (retry, più tab)
+    # condividono comunque la stessa generazione
+    cacheable = output_cache.cacheable(data)
+
+    # Richiesta identica già renderizzata: ritorna subito il file in cache
+    cached_filename = cacheable and output_cache.lookup(fingerprint, audio_format)
+    if cached_filename:
+        channel = ProgressChannel()
+        channel.finish(
+            progress=100,
+            stage="Completato! (cache)",
+            eta=0,
+            audio_url=f"/api/audio/{cached_filename}",
+            cached=True,
+        )
+        return sse_response(channel)
+
+    # Stessa richiesta già in generazione: ci si aggancia al suo stream
+    channel, created = inflight_jobs.open(
+        fingerprint, progress=0, stage="Inizializzazione...", eta=0
+    )
+    if not created:
+        return sse_response(channel)
+
+    personality_name = data.get("personality_name")
+
+    def generation_thread():
+        """Thread che accoda la generazione, ne attende il risultato e salva il file"""
+        try:
+            if personality_name:
+                generation_stage = (
+                    f"Generazione multi-segmento (personalità: {personality_name})..."
+                )
+            else:
+                device = "GPU" if manager.device_policy.is_cuda else "CPU"
+                generation_stage = f"Generazione audio (inferenza {device})..."
+
+            def on_start(job):
+                # Check e switch modello se necessario (eseguito dal worker)
+                if expected_model == manager.current_model_type:
+                    stage = generation_stage
+                elif expected_model in manager.resident_models:
+                    stage = f"Attivazione modello residente: {expected_model}..."
                 else:
-                    audio_url = f"/api/audio/{base_filename}.wav"
-
-                # Fase 6: Finalizzazione (95%)
-                progress_state["progress"] = 95
-                progress_state["stage"] = "Finalizzazione..."
-                progress_state["eta"] = 0
-                time.sleep(
-                    0.4
-                )  # Permette al loop SSE di catturare questo aggiornamento
-
-                # Completato (100%)
-                progress_state["progress"] = 100
-                progress_state["stage"] = "Completato!"
-                progress_state["eta"] = 0
-                progress_state["audio_url"] = audio_url
-                time.sleep(
-                    0.4
-                )  # Permette al loop SSE di catturare questo aggiornamento PRIMA di done=True
-                progress_state["done"] = True
-
-            except Exception as e:
-                progress_state["error"] = str(e)
-
-        # Avvia thread generazione
-        thread = threading.Thread(target=generation_thread)
-        thread.start()
-
-        # Stream aggiornamenti progresso in tempo reale
-        last_progress = -1
-        last_heartbeat = time.time()
-        while not progress_state["done"] and not progress_state["error"]:
-            current_time = time.time()
-            # Invia aggiornamento se progresso è cambiato O se è passato troppo tempo (heartbeat)
-            if (
-                progress_state["progress"] != last_progress
-                or (current_time - last_heartbeat) > 2
+                    stage = f"Caricamento modello: {expected_model}..."
+                channel.update(progress=20, stage=stage)
+
+            # Fase 2: Generazione (20-90%, progresso reale dal loop di decodifica)
+            def on_decode_progress(info: dict):
+                channel.update(
+                    progress=20 + int(info["fraction"] * 70),
+                    stage=generation_stage,
+                    eta=int(round(info["eta"])) if info["eta"] is not None else 0,
+                    tokens_per_sec=info["tokens_per_sec"],
+                    audio_seconds=info["audio_seconds"],
+                )
+
+            # Richieste senza personalità su CustomVoice/VoiceDesign sono batchabili;
+            # il batch ha un solo seed e una sola temperatura, quindi fanno parte
+            # della chiave
+            batchable = expected_model in ("custom", "design") and not personality_name
+            job = scheduler.submit(
+                expected_model,
+                batch_fn=run_generation_batch,
+                batch_key=(
+                    (expected_model, data.get("seed"), data.get("temperature"))
+                    if batchable
+                    else None
+                ),
+                payload={"params": data, "progress_callback": on_decode_progress},
+                on_start=on_start,
+            )
+            position = scheduler.position(job)
+            if position > 0:
+                channel.update(stage=f"In coda (posizione {position})...")
+
+            wavs, sr = job.result()
+
+            # Fase 3: Post-processing (90%) e conversione
+            stage = "Conversione in MP3..." if audio_format == "mp3" else "Salvataggio file WAV..."
+            channel.update(progress=90, stage=stage, eta=0)
+            filename = render_output(
+                wavs[0], sr, audio_format, fingerprint if cacheable else None
+            )
+            audio_url = f"/api/audio/{filename}"
+
+            # Completato (100%)
+            channel.finish(
+                progress=100, stage="Completato!", eta=0, audio_url=audio_url
+            )
+
+        except Exception as e:
+            channel.fail(str(e))
+        finally:
+            inflight_jobs.close(fingerprint, channel)
+
+    # Avvia thread generazione (lo switch del modello lo fa il worker dello scheduler)
+    threading.Thread(target=generation_thread, daemon=True).start()
+
+    return sse_response(channel)
+
+
+class _ZipStream:
+    """Buffer write-only per ZipFile: i byte scritti vengono svuotati a ogni yield"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+@app.route("/api/generate_batch", methods=["POST"])
+def generate_batch():
+    """
+    Sintesi di molti testi brevi indipendenti (menu IVR, battute di gioco...).
+
+    Input (JSON): parametri condivisi come /api/generate_stream (modello,
+    speaker/instruct, personalità o riferimento, lingua, temperatura, seed,
+    format), più
+    - items: lista di testi, oppure di oggetti {"text", "id"} (id opzionale)
+    - output: "manifest" (default, JSON con gli URL) oppure "zip" (stream
+      zip con un file per item, nell'ordine della lista)
+
+    Con seed esplicito (o temperatura 0 nella clonazione manuale) gli item
+    già in cache non vengono rigenerati e i testi duplicati sono sintetizzati
+    una volta sola; senza seed ogni item è una generazione nuova. Gli item da
+    sintetizzare vengono eseguiti con chiamate batch al modello (fino a
+    MAX_BATCH_SIZE testi per job).
+    """
+    data = request.json
+    expected_model = data.get("expected_model")
+    audio_format = data.get("format", "wav").lower()
+    output_mode = data.get("output", "manifest").lower()
+    items = data.get("items") or []
+
+    if output_mode not in ("manifest", "zip"):
+        return jsonify({"error": "Output non valido (manifest o zip)"}), 400
+    if not items:
+        return jsonify({"error": "Nessun item da generare"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Massimo {BATCH_MAX_ITEMS} item per richiesta"}), 400
+
+    shared = {k: v for k, v in data.items() if k not in ("items", "output")}
+    cacheable = output_cache.cacheable(shared)
+    try:
+        attach_personality_config(shared)
+        entries = []
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = {"text": item}
+            text = (item.get("text") or "").strip()
+            if not text:
+                raise ValueError(f"Item {index}: testo vuoto")
+            # In modalità personalità un item di soli tag (es. "[neutro]") non
+            # ha segmenti da sintetizzare
+            if shared.get("personality_config") and not any(
+                segment_text.strip()
+                for _, segment_text in manager._parse_tagged_text(text)
             ):
-                update = {
-                    "progress": progress_state["progress"],
-                    "stage": progress_state["stage"],
-                    "eta": progress_state["eta"],
+                raise ValueError(f"Item {index}: nessun testo da sintetizzare oltre ai tag")
+            params = {**shared, "text": text}
+            entries.append(
+                {
+                    "index": index,
+                    "id": item.get("id", index),
+                    "text": text,
+                    "params": params,
+                    "fingerprint": (
+                        output_cache.fingerprint(params, audio_format)
+                        if cacheable
+                        else None
+                    ),
                 }
-                yield f"data: {json.dumps(update)}\n\n"
-                last_progress = progress_state["progress"]
-                last_heartbeat = current_time
-            time.sleep(0.3)  # Controlla ogni 300ms
-
-        # Invia risultato finale o errore
-        if progress_state["error"]:
-            yield f"data: {json.dumps({'error': progress_state['error']})}\n\n"
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Item in cache: niente sintesi. Testi duplicati vengono generati una volta
+    # sola (solo se cacheabili: senza seed ogni item ha la sua generazione)
+    pending = {}
+    for entry in entries:
+        cached_filename = None
+        if cacheable:
+            cached_filename = output_cache.lookup(entry["fingerprint"], audio_format)
+        entry["cached"] = cached_filename is not None
+        entry["filename"] = cached_filename
+        entry["key"] = entry["fingerprint"] or f"item-{entry['index']}"
+        if cached_filename is None:
+            pending.setdefault(entry["key"], entry["params"])
+
+    # Un job per gruppo di testi: tra un gruppo e l'altro il worker resta
+    # disponibile per le altre richieste
+    keys = list(pending)
+    jobs = []
+    for group_start in range(0, len(keys), MAX_BATCH_SIZE):
+        group = keys[group_start : group_start + MAX_BATCH_SIZE]
+        params_list = [pending[key] for key in group]
+        job = scheduler.submit(
+            expected_model, lambda m, p=params_list: m.generate_batch(p)
+        )
+        jobs.append((group, job))
+
+    def complete_entries():
+        """
+        Attende i job in ordine e salva l'audio; yield di ogni item pronto.
+        Se un job fallisce, i suoi item hanno l'eccezione in entry["error"].
+        """
+        rendered = {}
+        job_iter = iter(jobs)
+        for entry in entries:
+            key = entry["key"]
+            while entry["filename"] is None and key not in rendered:
+                group, job = next(job_iter)
+                try:
+                    for group_key, (wavs, sr) in zip(group, job.result()):
+                        rendered[group_key] = render_output(
+                            wavs[0], sr, audio_format, group_key if cacheable else None
+                        )
+                except Exception as e:
+                    for group_key in group:
+                        rendered.setdefault(group_key, e)
+            if entry["filename"] is None:
+                if isinstance(rendered[key], Exception):
+                    entry["error"] = rendered[key]
+                else:
+                    entry["filename"] = rendered[key]
+            yield entry
+
+    def manifest_item(entry: dict) -> dict:
+        item = {
+            "index": entry["index"],
+            "id": entry["id"],
+            "text": entry["text"],
+            "audio_url": None,
+            "cached": entry["cached"],
+        }
+        if "error" in entry:
+            item["error"] = str(entry["error"])
         else:
-            final = {
-                "progress": 100,
-                "stage": "Completato!",
-                "eta": 0,
-                "audio_url": progress_state["audio_url"],
-                "done": True,
+            item["audio_url"] = f"/api/audio/{entry['filename']}"
+        return item
+
+    if output_mode == "manifest":
+        start_time = time.time()
+        completed = list(complete_entries())
+        for entry in completed:
+            if "error" in entry:
+                status = 400 if isinstance(entry["error"], ValueError) else 500
+                return jsonify({"error": str(entry["error"])}), status
+        manifest = [manifest_item(entry) for entry in completed]
+        return jsonify(
+            {
+                "items": manifest,
+                "generated": len(pending),
+                "cached": sum(1 for entry in entries if entry["cached"]),
+                "elapsed_seconds": round(time.time() - start_time, 3),
             }
-            yield f"data: {json.dumps(final)}\n\n"
+        )
+
+    def stream_zip():
+        # Lo stream è già iniziato: un item fallito non può più cambiare lo
+        # status HTTP, quindi l'errore finisce nel manifest.json e l'archivio
+        # viene comunque chiuso correttamente
+        buffer = _ZipStream()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            manifest = []
+            for entry in complete_entries():
+                if "error" in entry:
+                    manifest.append({**manifest_item(entry), "file": None})
+                    continue
+                # L'id arriva dal client: solo [A-Za-z0-9_-] nel nome del file
+                safe_id = personality_manager._sanitize_name(str(entry["id"]))
+                safe_id = "".join(c for c in safe_id if c.isascii())
+                arcname = (
+                    f"{entry['index']:04d}_{safe_id}.{audio_format}"
+                    if safe_id
+                    else f"{entry['index']:04d}.{audio_format}"
+                )
+                archive.write(OUTPUT_DIR / entry["filename"], arcname)
+                manifest.append({**manifest_item(entry), "file": arcname})
+                yield buffer.drain()
+            archive.writestr(
+                "manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False)
+            )
+        yield buffer.drain()
 
     return Response(
-        stream_with_context(generate_with_progress()), mimetype="text/event-stream"
+        stream_with_context(stream_zip()),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=batch.zip"},
     )
 
 
+def start_longform(data: dict, audio_format: str, fingerprint: str) -> Response:
+    """Avvia (o riprende) un job long-form e ritorna lo stream SSE del progresso"""
+    # Output già cucito in precedenza (solo per richieste riproducibili)
+    cached_filename = None
+    if output_cache.cacheable(data):
+        cached_filename = output_cache.lookup(fingerprint, audio_format)
+    if cached_filename:
+        channel = ProgressChannel()
+        channel.finish(
+            progress=100,
+            stage="Completato! (cache)",
+            eta=0,
+            audio_url=f"/api/audio/{cached_filename}",
+            job_id=fingerprint,
+            cached=True,
+        )
+        return sse_response(channel)
+
+    # job_id fin dal primo evento: serve a /api/longform/<job_id>/resume
+    # proprio quando il job si interrompe
+    channel, created = inflight_jobs.open(
+        fingerprint,
+        progress=0,
+        stage="Suddivisione del testo...",
+        eta=0,
+        job_id=fingerprint,
+    )
+    if not created:
+        return sse_response(channel, "job_id")
+
+    def longform_thread():
+        try:
+            filename = longform_runner.run(data, audio_format, fingerprint, channel)
+            channel.finish(
+                progress=100,
+                stage="Completato!",
+                eta=0,
+                audio_url=f"/api/audio/{filename}",
+                job_id=fingerprint,
+            )
+        except Exception as e:
+            channel.fail(str(e), job_id=fingerprint)
+        finally:
+            inflight_jobs.close(fingerprint, channel)
+
+    threading.Thread(target=longform_thread, daemon=True).start()
+    return sse_response(channel, "job_id")
+
+
+@app.route("/api/longform", methods=["POST"])
+def generate_longform():
+    """
+    Sintesi long-form (capitoli, audiolibri) con checkpoint.
+
+    Stessi parametri di /api/generate_stream. Il testo viene diviso in chunk
+    ai confini di paragrafo/frase e ogni chunk completato viene salvato:
+    reinviare la stessa richiesta dopo un'interruzione riprende dall'ultimo
+    chunk completato. Output: SSE stream con progresso per chunk.
+    """
+    data = request.json
+    audio_format = data.get("format", "wav").lower()
+
+    try:
+        attach_personality_config(data)
+        fingerprint = longform_runner.job_fingerprint(data, audio_format)
+    except Exception as e:
+        channel = ProgressChannel()
+        channel.fail(str(e))
+        return sse_response(channel)
+
+    return start_longform(data, audio_format, fingerprint)
+
+
+@app.route("/api/longform/pending", methods=["GET"])
+def list_pending_longform():
+    """Ritorna i job long-form interrotti, riprendibili"""
+    jobs = [
+        {
+            "job_id": manifest["job_id"],
+            "completed": manifest["completed"],
+            "total": len(manifest["chunks"]),
+            "created_at": manifest["created_at"],
+        }
+        for manifest in longform_runner.pending_jobs()
+    ]
+    return jsonify({"jobs": jobs})
+
+
+@app.route("/api/longform/<job_id>/resume", methods=["POST"])
+def resume_longform(job_id):
+    """Riprende un job long-form interrotto usando i parametri del suo manifest"""
+    manifest = longform_runner.load_manifest(job_id)
+    if manifest is None:
+        return jsonify({"error": "Job long-form non trovato"}), 404
+
+    data = {**manifest["params"], "text": manifest["text"]}
+    return start_longform(data, manifest["format"], job_id)
+
+
 @app.route("/api/audio/<filename>")
 def serve_audio(filename):
     """Serve file audio generati"""
@@ -328,6 +791,8 @@ def transcribe_audio():
     filename = data.get("filename")
     start = data.get("start", 0)
     end = data.get("end")
+    model_size = data.get("model_size")
+    language = data.get("language", "it")
 
     if not filename:
         return jsonify({"error": "Filename mancante"}), 400
@@ -337,8 +802,12 @@ def transcribe_audio():
         return jsonify({"error": "File non trovato"}), 404
 
     try:
-        text = manager.transcribe(str(file_path), start, end)
+        text = manager.transcribe(
+            str(file_path), start, end, model_size=model_size, language=language
+        )
         return jsonify({"text": text})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -496,120 +965,88 @@ def create_smart_personality():
     except Exception as e:
         return jsonify({"error": f"Errore validazione: {str(e)}"}), 400
 
-    def generate_with_progress():
-        """Generatore SSE per streaming progresso"""
-        progress_state = {
-            "progress": 0,
-            "stage": "Inizializzazione...",
-            "done": False,
-            "error": None,
-        }
+    channel = ProgressChannel(progress=0, stage="Inizializzazione...")
 
-        def progress_callback(stage: str, progress: int):
-            """Callback per aggiornare lo stato del progresso"""
-            progress_state["stage"] = stage
-            progress_state["progress"] = progress
+    def progress_callback(stage: str, progress: int):
+        """Callback per aggiornare lo stato del progresso"""
+        channel.update(stage=stage, progress=progress)
 
-        def generation_thread():
-            """Thread che esegue la creazione effettiva"""
-            try:
-                # Use pre-extracted form data (captured in closure)
-                name = form_name
-                voice_description = form_voice_description
-                emotions = form_emotions
-                segment_duration_ms = form_segment_duration_ms
-                crossfade_ms = form_crossfade_ms
+    def generation_thread():
+        """Thread che esegue la creazione effettiva"""
+        try:
+            # Use pre-extracted form data (captured in closure)
+            name = form_name
+            voice_description = form_voice_description
+            emotions = form_emotions
+            segment_duration_ms = form_segment_duration_ms
+            crossfade_ms = form_crossfade_ms
 
-                progress_state["stage"] = "Caricamento audio..."
-                progress_state["progress"] = 2
+            channel.update(stage="Caricamento audio...", progress=2)
 
-                try:
-                    # Trascrivi l'audio
-                    progress_state["stage"] = "Trascrizione audio (Whisper)..."
-                    progress_state["progress"] = 5
-                    transcript = manager.transcribe(str(temp_audio_path))
-
-                    # Carica il modello VoiceDesign
-                    progress_state["stage"] = "Caricamento modello VoiceDesign..."
-                    progress_state["progress"] = 10
+            try:
+                def on_start(job):
+                    # Carica il modello VoiceDesign (eseguito dal worker)
                     if manager.current_model_type != "design":
-                        manager.load_model("design")
+                        channel.update(
+                            stage="Caricamento modello VoiceDesign...", progress=10
+                        )
 
-                    progress_state["stage"] = "Generazione emozioni..."
-                    progress_state["progress"] = 15
+                # Il caricamento di VoiceDesign è un job a sé: il worker lo esegue
+                # mentre questo thread trascrive (sottosistema ASR), senza restare
+                # occupato in attesa del testo
+                scheduler.submit("design", lambda model_manager: None, on_start=on_start)
+
+                channel.update(stage="Trascrizione audio (Whisper)...", progress=5)
+                transcript = manager.transcribe(str(temp_audio_path))
+
+                def create_job(model_manager):
+                    channel.update(stage="Generazione emozioni...", progress=15)
 
                     # Crea la smart personality
-                    config = personality_manager.create_smart(
+                    return personality_manager.create_smart(
                         name=name,
                         voice_description=voice_description,
                         source_audio_path=temp_audio_path,
                         source_transcript=transcript,
                         emotions=emotions,
-                        model_manager=manager,
+                        model_manager=model_manager,
                         chimera_maker=chimera_maker,
                         segment_duration_ms=segment_duration_ms,
                         crossfade_ms=crossfade_ms,
                         progress_callback=progress_callback,
                     )
 
-                    progress_state["stage"] = "Completato!"
-                    progress_state["progress"] = 100
-                    progress_state["personality_name"] = config["name"]
-                    progress_state["done"] = True
-
-                finally:
-                    # Pulizia file temporaneo
-                    try:
-                        temp_audio_path.unlink()
-                    except Exception:
-                        pass
-
-            except Exception as e:
-                import traceback
-
-                traceback.print_exc()
-                progress_state["error"] = str(e)
-                progress_state["done"] = True
-
-        # Avvia thread generazione
-        thread = threading.Thread(target=generation_thread)
-        thread.start()
-
-        # Stream aggiornamenti progresso
-        last_progress = -1
-        last_heartbeat = time.time()
-
-        while not progress_state["done"]:
-            current_time = time.time()
-            # Invia aggiornamento se il progresso è cambiato O per heartbeat
-            if (
-                progress_state["progress"] != last_progress
-                or (current_time - last_heartbeat) > 2
-            ):
-                update = {
-                    "progress": progress_state["progress"],
-                    "stage": progress_state["stage"],
-                }
-                yield f"data: {json.dumps(update)}\n\n"
-                last_progress = progress_state["progress"]
-                last_heartbeat = current_time
+                job = scheduler.submit("design", create_job, on_start=on_start)
+                position = scheduler.position(job)
+                if position > 0:
+                    channel.update(stage=f"In coda (posizione {position})...")
+                config = job.result()
 
-            time.sleep(0.5)  # Controlla ogni 500ms
+                channel.finish(
+                    progress=100,
+                    stage="Completato!",
+                    personality_name=config["name"],
+                )
 
-        # Invia risultato finale
-        if progress_state["error"]:
-            yield f"data: {json.dumps({'error': progress_state['error']})}\n\n"
-        else:
-            final = {
-                "progress": 100,
-                "stage": "Completato!",
-                "done": True,
-                "personality_name": progress_state.get("personality_name"),
-            }
-            yield f"data: {json.dumps(final)}\n\n"
+            finally:
+                # Pulizia file temporaneo
+                try:
+                    temp_audio_path.unlink()
+                except Exception:
+                    pass
+
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            channel.fail(str(e))
+
+    # Avvia thread generazione
+    threading.Thread(target=generation_thread, daemon=True).start()
 
     return Response(
-        stream_with_context(generate_with_progress()), mimetype="text/event-stream"
+        stream_with_context(channel.sse("progress", "stage")),
+        mimetype="text/event-stream",
     )
 
 
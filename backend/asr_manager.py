@@ -0,0 +1,256 @@
+"""
+ASR Manager Module - Sottosistema di trascrizione (Whisper)
+
+Gestisce i modelli Whisper separatamente dal pool dei modelli TTS:
+- placement proprio (default auto: CUDA se disponibile, come prima; su GPU
+  la memoria di Whisper conta nel budget del pool TTS, che libera spazio
+  scaricando i modelli residenti inattivi ma mai quello attivo. Con
+  QWENTTS_ASR_DEVICE=cpu conviene un modello più piccolo, es. "turbo")
+- ciclo di vita proprio (lazy loading / unload indipendenti)
+- dimensione del modello selezionabile per singola richiesta
+- cache persistente (SQLite) delle trascrizioni, indicizzata per contenuto
+  del file, intervallo, modello, lingua e qualità
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Optional
+
+import torch
+import whisper
+
+from audio_io import read_audio_range
+from cache_utils import file_content_hash
+
+# Dimensione Whisper di default (large-v3 per la massima qualità)
+ASR_MODEL_SIZE = os.environ.get("QWENTTS_ASR_MODEL", "large-v3")
+# Device per Whisper: "auto" (CUDA se disponibile), "cpu" oppure "cuda"
+ASR_DEVICE = os.environ.get("QWENTTS_ASR_DEVICE", "auto").lower()
+# File SQLite della cache persistente delle trascrizioni ("" = cache disabilitata)
+ASR_CACHE_PATH = os.environ.get(
+    "QWENTTS_ASR_CACHE",
+    str(Path(__file__).parent.parent / "cache" / "transcripts.sqlite"),
+)
+
+# Dimensioni Whisper accettate
+ASR_MODEL_SIZES = (
+    "tiny",
+    "base",
+    "small",
+    "medium",
+    "large-v1",
+    "large-v2",
+    "large-v3",
+    "turbo",
+)
+# Parametri (milioni) di ogni dimensione, per stimare la memoria prima del caricamento
+_WHISPER_PARAMS_M = {
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large-v1": 1550,
+    "large-v2": 1550,
+    "large-v3": 1550,
+    "turbo": 809,
+}
+
+
+class ASRManager:
+    """Gestisce i modelli Whisper su un device dedicato"""
+
+    def __init__(
+        self,
+        model_size: str = ASR_MODEL_SIZE,
+        device: str = ASR_DEVICE,
+        cache_path: str = ASR_CACHE_PATH,
+        reserve_memory: Optional[Callable[[int], None]] = None,
+    ):
+        """
+        Args:
+            model_size: Dimensione Whisper di default
+            device: Device di placement ("cpu", "cuda" o "auto")
+            cache_path: File SQLite della cache trascrizioni ("" = disabilitata)
+            reserve_memory: Callback reserve_memory(byte) chiamata prima di
+                caricare un modello su GPU (libera spazio nel pool TTS)
+        """
+        if device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.default_model_size = model_size
+        self.device = device
+        self.reserve_memory = reserve_memory
+        self.models = {}  # model_size -> modello Whisper caricato
+        self.model_bytes = {}  # model_size -> byte di parametri e buffer
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self.cache_path = Path(cache_path) if cache_path else None
+        if self.cache_path is not None:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS transcripts ("
+                    "key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL)"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Una connessione per operazione: sicuro tra thread diversi
+        return sqlite3.connect(str(self.cache_path), timeout=10)
+
+    def _cache_key(self, audio_path, start, end, model_size, language, quality) -> str:
+        """Chiave della cache: contenuto del file + intervallo + parametri di decoding"""
+        return "|".join(
+            [
+                file_content_hash(audio_path),
+                f"{float(start or 0):.3f}",
+                f"{float(end):.3f}" if end else "",
+                model_size,
+                language or "",
+                quality,
+            ]
+        )
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        if self.cache_path is None:
+            return None
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT text FROM transcripts WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _cache_put(self, key: str, text: str):
+        if self.cache_path is None:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts (key, text, created_at) VALUES (?, ?, ?)",
+                (key, text, time.time()),
+            )
+
+    def _resolve_size(self, model_size: Optional[str]) -> str:
+        model_size = model_size or self.default_model_size
+        if model_size not in ASR_MODEL_SIZES:
+            raise ValueError(f"Modello Whisper '{model_size}' non supportato")
+        return model_size
+
+    def load(self, model_size: Optional[str] = None):
+        """Carica (se necessario) e ritorna il modello Whisper richiesto"""
+        model_size = self._resolve_size(model_size)
+        with self._lock:
+            if model_size not in self.models:
+                if self.on_gpu and self.reserve_memory is not None:
+                    # Pesi Whisper in fp32
+                    self.reserve_memory(_WHISPER_PARAMS_M[model_size] * 10**6 * 4)
+                model = whisper.load_model(model_size, device=self.device)
+                self.model_bytes[model_size] = sum(
+                    t.element_size() * t.nelement()
+                    for t in list(model.parameters()) + list(model.buffers())
+                )
+                self.models[model_size] = model
+            return self.models[model_size]
+
+    @property
+    def on_gpu(self) -> bool:
+        return self.device.startswith("cuda")
+
+    def memory_bytes(self) -> int:
+        """Memoria occupata dai modelli Whisper caricati (0 su CPU)"""
+        if not self.on_gpu:
+            return 0
+        return sum(self.model_bytes.values())
+
+    def unload(self, model_size: Optional[str] = None):
+        """Scarica un modello Whisper (None = tutti)"""
+        with self._lock:
+            if model_size is None:
+                self.models.clear()
+                self.model_bytes.clear()
+            else:
+                self.models.pop(model_size, None)
+                self.model_bytes.pop(model_size, None)
+        if self.on_gpu:
+            torch.cuda.empty_cache()
+
+    def transcribe(
+        self,
+        audio_path: str,
+        start: float = 0,
+        end: Optional[float] = None,
+        model_size: Optional[str] = None,
+        language: Optional[str] = "it",
+        quality: str = "best",
+    ) -> str:
+        """
+        Trascrive un file audio (o un suo intervallo).
+
+        Args:
+            audio_path: Path del file audio
+            start: Inizio dell'intervallo in secondi
+            end: Fine dell'intervallo in secondi (None = fino alla fine)
+            model_size: Dimensione Whisper (None = default)
+            language: Lingua attesa (None = rilevamento automatico)
+            quality: "best" (beam search) oppure "fast" (greedy)
+
+        Returns:
+            Testo trascritto
+        """
+        model_size = self._resolve_size(model_size)
+
+        # Stesso file, intervallo e parametri: basta una lookup
+        cache_key = self._cache_key(audio_path, start, end, model_size, language, quality)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+
+        model = self.load(model_size)
+
+        # Decodifica e ricampiona a 16kHz solo l'intervallo richiesto (Whisper vuole float32)
+        y, _ = read_audio_range(audio_path, start or 0, end or None, target_sr=16000)
+
+        options = {
+            "language": language,
+            "task": "transcribe",
+            "fp16": self.on_gpu,
+            "temperature": 0,  # Deterministic output (no sampling randomness)
+        }
+        if quality == "best":
+            options.update(
+                {
+                    "beam_size": 5,  # Beam search for better quality
+                    "best_of": 5,  # Consider multiple candidates
+                    "patience": 1.0,  # Patience for beam search
+                    "condition_on_previous_text": True,  # Better context handling
+                    "initial_prompt": "",  # Can be customized if needed
+                    "word_timestamps": False,  # Don't need word-level timestamps
+                }
+            )
+
+        # Un modello Whisper non è thread-safe: una trascrizione alla volta
+        with self._lock:
+            result = model.transcribe(y, **options)
+
+        text = result["text"].strip()
+        self._cache_put(cache_key, text)
+        return text
+
+    def get_status(self) -> dict:
+        """Ritorna lo stato del sottosistema ASR"""
+        return {
+            "device": self.device,
+            "default_model": self.default_model_size,
+            "loaded_models": sorted(self.models),
+            "memory_gb": round(self.memory_bytes() / 1024**3, 2),
+            "cache": {
+                "enabled": self.cache_path is not None,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+            },
+        }
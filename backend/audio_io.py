@@ -0,0 +1,72 @@
+"""
+Audio IO Module - Lettura di intervalli audio senza decodificare tutto il file
+
+Per selezionare una finestra di pochi secondi da una registrazione lunga
+non serve decodificare (e ricampionare) l'intero file: si fa seek al primo
+frame richiesto, si leggono solo i frame dell'intervallo e si ricampiona
+solo quella finestra. Memoria e tempo dipendono dalla durata della finestra.
+"""
+
+from typing import Optional, Tuple
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+
+def audio_duration(path) -> float:
+    """Durata del file in secondi, letta dall'header quando possibile"""
+    try:
+        return sf.info(str(path)).duration
+    except RuntimeError:
+        # Formato non gestito da libsndfile: decodifica tramite librosa
+        return librosa.get_duration(path=str(path))
+
+
+def read_audio_range(
+    path,
+    start: float = 0.0,
+    end: Optional[float] = None,
+    target_sr: Optional[int] = None,
+    mono: bool = True,
+) -> Tuple[np.ndarray, int]:
+    """
+    Legge solo l'intervallo [start, end) di un file audio.
+
+    Args:
+        path: Path del file audio
+        start: Inizio dell'intervallo in secondi
+        end: Fine dell'intervallo in secondi (None = fino alla fine)
+        target_sr: Sample rate di output (None = quello del file)
+        mono: Se True media i canali
+
+    Returns:
+        Tuple (array float32, sample_rate)
+    """
+    start = max(0.0, float(start or 0.0))
+    end = float(end) if end is not None else None
+
+    try:
+        with sf.SoundFile(str(path)) as f:
+            sr = f.samplerate
+            start_frame = min(f.frames, int(start * sr))
+            end_frame = f.frames if end is None else min(f.frames, int(end * sr))
+            f.seek(start_frame)
+            y = f.read(
+                max(0, end_frame - start_frame), dtype="float32", always_2d=True
+            )
+        y = y.mean(axis=1) if mono else y.T
+    except RuntimeError:
+        # Formato non gestito da libsndfile (es. alcuni MP3/M4A):
+        # librosa decodifica solo a partire da offset e per la durata richiesta
+        duration = end - start if end is not None else None
+        y, sr = librosa.load(
+            str(path), sr=None, mono=mono, offset=start, duration=duration
+        )
+
+    if target_sr is not None and sr != target_sr:
+        # Ricampiona solo la finestra letta
+        y = librosa.resample(y, orig_sr=sr, target_sr=target_sr)
+        sr = target_sr
+
+    return y.astype(np.float32, copy=False), sr
@@ -0,0 +1,183 @@
+"""
+Cache Utils Module - Strutture di caching condivise dal backend
+
+Contiene:
+- LRUCache: cache in memoria thread-safe con eviction LRU e budget in byte
+- file_content_hash: hash del contenuto di un file, memoizzato per (path, mtime, size)
+- estimate_nbytes: stima dell'occupazione in memoria di tensori/array annidati
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+def estimate_nbytes(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Stima ricorsivamente i byte occupati da tensori torch / array numpy
+    contenuti in un oggetto (liste, tuple, dict, dataclass, oggetti generici).
+
+    Args:
+        obj: Oggetto da misurare
+
+    Returns:
+        Numero di byte stimato (0 per oggetti senza buffer)
+    """
+    if _seen is None:
+        _seen = set()
+    if obj is None or id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    # Tensori torch (duck typing per non importare torch qui)
+    if hasattr(obj, "element_size") and hasattr(obj, "nelement"):
+        return int(obj.element_size() * obj.nelement())
+    # Array numpy
+    if hasattr(obj, "nbytes") and hasattr(obj, "dtype"):
+        return int(obj.nbytes)
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(estimate_nbytes(v, _seen) for v in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(estimate_nbytes(v, _seen) for v in obj)
+    if hasattr(obj, "__dict__"):
+        return sum(estimate_nbytes(v, _seen) for v in vars(obj).values())
+    return 0
+
+
+class LRUCache:
+    """Cache in memoria con eviction LRU vincolata da un budget in byte"""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_items: Optional[int] = None,
+        sizeof: Callable[[Any], int] = estimate_nbytes,
+    ):
+        """
+        Args:
+            max_bytes: Budget massimo di memoria (0 disabilita la cache)
+            max_items: Numero massimo di elementi (None = illimitato)
+            sizeof: Funzione per stimare la dimensione di un valore
+        """
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Ritorna il valore per key (aggiornando l'ordine LRU) o default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size: Optional[int] = None) -> bool:
+        """
+        Inserisce un valore, evictando gli elementi meno usati se serve.
+
+        Returns:
+            False se il valore è più grande dell'intero budget (non inserito)
+        """
+        if size is None:
+            size = self._sizeof(value)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+
+            while self._data and (
+                self._bytes > self.max_bytes
+                or (self.max_items is not None and len(self._data) > self.max_items)
+            ):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def pop(self, key, default=None):
+        """Rimuove e ritorna un valore"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        """Svuota la cache"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Ritorna statistiche d'uso della cache"""
+        with self._lock:
+            return {
+                "items": len(self._data),
+                "size_mb": round(self._bytes / 1024**2, 2),
+                "budget_mb": round(self.max_bytes / 1024**2, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Memo degli hash: path -> (mtime_ns, size, digest)
+_hash_memo: Dict[str, tuple] = {}
+_hash_lock = threading.Lock()
+
+
+def file_content_hash(path) -> str:
+    """
+    Calcola lo SHA-1 del contenuto di un file.
+    Il risultato è memoizzato per (path, mtime, size), quindi un file
+    invariato viene letto da disco una sola volta.
+
+    Args:
+        path: Path del file
+
+    Returns:
+        Digest esadecimale del contenuto
+    """
+    path = os.path.abspath(str(path))
+    st = os.stat(path)
+
+    with _hash_lock:
+        memo = _hash_memo.get(path)
+    if memo is not None and memo[0] == st.st_mtime_ns and memo[1] == st.st_size:
+        return memo[2]
+
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    with _hash_lock:
+        _hash_memo[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
@@ -7,13 +7,225 @@ Questo modulo crea file audio "chimera" fondendo:
 
 Il risultato è un riferimento ibrido che il modello Base può usare per
 apprendere sia il timbro che l'emozione tramite in-context learning.
+
+Tutte le operazioni (slicing, normalizzazione, crossfade, scrittura PCM
+16-bit) lavorano direttamente su array NumPy int16, senza file temporanei
+né processi ffmpeg. Con crossfade lineare, normalizzazione RMS e segmento
+utente centrale si riproduce l'aritmetica della vecchia implementazione
+pydub (slicing al millisecondo, gain di audioop, fade lineare), quindi i
+campioni PCM prodotti sono identici. Di default il segmento utente è
+invece la finestra di parlato più densa scelta dal VAD (speech_window).
 """
 
+import math
+import os
 from pathlib import Path
-from pydub import AudioSegment
-from typing import Tuple, Optional
-import soundfile as sf
+from typing import Optional, Tuple
+
 import numpy as np
+import soundfile as sf
+
+from audio_io import read_audio_range
+from speech_window import frame_energy_db, select_speech_window
+
+# Segmento dell'audio utente: "speech" (finestra di parlato più densa, VAD)
+# oppure "center" (centro dell'audio, comportamento storico)
+SOURCE_SELECTION = os.environ.get("QWENTTS_CHIMERA_SOURCE_SEGMENT", "speech").lower()
+
+# Limiti dei campioni PCM 16-bit
+_PCM16_MIN = -32768
+_PCM16_MAX = 32767
+# Ampiezza massima di riferimento per il calcolo dei dBFS (come pydub)
+_PCM16_FULL_SCALE = 32768.0
+# Attenuazione agli estremi del crossfade lineare (dB)
+_SILENCE_GAIN_DB = -120.0
+
+
+def _db_to_float(db: float) -> float:
+    return 10 ** (float(db) / 20)
+
+
+def _len_ms(audio: np.ndarray, sample_rate: int) -> int:
+    """Durata in millisecondi arrotondata (come len() di un AudioSegment)"""
+    return round(1000 * (float(len(audio)) / sample_rate))
+
+
+def _frame_at(ms: float, sample_rate: int, length_ms: int) -> int:
+    """Indice di frame di una posizione in ms (negativa = dalla fine)"""
+    if ms < 0:
+        ms = length_ms - abs(ms)
+    return int(ms * (sample_rate / 1000.0))
+
+
+def to_pcm16(wav: np.ndarray) -> np.ndarray:
+    """
+    Converte audio float [-1, 1] in PCM 16-bit come la scrittura WAV di
+    libsndfile: passaggio per int32 (scala 2^31, arrotondamento, clipping)
+    e scarto dei 16 bit bassi.
+
+    Returns:
+        Array int16 di forma (frame, canali)
+    """
+    wav = np.asarray(wav)
+    if wav.dtype == np.int16:
+        pcm = wav
+    else:
+        scaled = np.rint(np.asarray(wav, dtype=np.float64) * 2.0**31)
+        pcm32 = np.clip(scaled, -(2**31), 2**31 - 1).astype(np.int64)
+        pcm = (pcm32 >> 16).astype(np.int16)
+    return pcm.reshape(len(pcm), -1)
+
+
+def load_pcm16(path: Path) -> Tuple[np.ndarray, int]:
+    """
+    Legge un file audio come PCM 16-bit (frame, canali).
+    I formati non gestiti da libsndfile vengono decodificati in float e
+    convertiti con la stessa scala di ffmpeg (32768 con clipping).
+    """
+    try:
+        data, sample_rate = sf.read(str(path), dtype="int16", always_2d=True)
+        return data, sample_rate
+    except RuntimeError:
+        y, sample_rate = read_audio_range(path, mono=False)
+        y = np.atleast_2d(y).T
+        pcm = np.clip(np.rint(y * 32768.0), _PCM16_MIN, _PCM16_MAX).astype(np.int16)
+        return pcm, sample_rate
+
+
+def write_pcm16(path: Path, audio: np.ndarray, sample_rate: int) -> Path:
+    """Scrive un array int16 come WAV PCM 16-bit"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(str(path), audio, sample_rate, subtype="PCM_16")
+    return path
+
+
+def _mul(audio: np.ndarray, factor) -> np.ndarray:
+    """Gain con la saturazione e l'arrotondamento (floor) di audioop.mul"""
+    values = audio.astype(np.float64) * factor
+    values = np.where(
+        values > _PCM16_MAX,
+        _PCM16_MAX,
+        np.where(values < _PCM16_MIN + 1.0, _PCM16_MIN, values),
+    )
+    return np.floor(values).astype(np.int16)
+
+
+def _add(audio1: np.ndarray, audio2: np.ndarray) -> np.ndarray:
+    """Somma campione per campione con saturazione"""
+    total = audio1.astype(np.int32) + audio2.astype(np.int32)
+    return np.clip(total, _PCM16_MIN, _PCM16_MAX).astype(np.int16)
+
+
+def _slice_ms(
+    audio: np.ndarray,
+    sample_rate: int,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Slicing in millisecondi con la semantica di AudioSegment[start:end]:
+    posizioni negative dalla fine, estremi limitati alla durata arrotondata
+    e padding di silenzio se la durata arrotondata supera i frame presenti.
+    """
+    length_ms = _len_ms(audio, sample_rate)
+    start = min(0 if start is None else start, length_ms)
+    end = min(length_ms if end is None else end, length_ms)
+    start_frame = _frame_at(start, sample_rate, length_ms)
+    end_frame = _frame_at(end, sample_rate, length_ms)
+
+    data = audio[start_frame:end_frame]
+    missing = (end_frame - start_frame) - len(data)
+    if missing > 0 and len(data) > 0:
+        silence = np.zeros((missing, audio.shape[1]), dtype=audio.dtype)
+        data = np.concatenate([data, silence])
+    return data
+
+
+def _ratecv(audio: np.ndarray, in_rate: int, out_rate: int) -> np.ndarray:
+    """
+    Conversione di sample rate con l'interpolazione lineare di audioop.ratecv
+    (stato iniziale nullo), vettorizzata.
+    """
+    if in_rate == out_rate or len(audio) == 0:
+        return audio
+    divisor = math.gcd(in_rate, out_rate)
+    in_rate, out_rate = in_rate // divisor, out_rate // divisor
+
+    # Il campione di output m cade tra gli input j-1 e j, j = ceil(m * in / out)
+    count = (len(audio) - 1) * out_rate // in_rate + 1
+    m = np.arange(count, dtype=np.int64)
+    j = -((-m * in_rate) // out_rate)
+    d = (j * out_rate - m * in_rate).astype(np.float64)[:, None]
+
+    samples = audio.astype(np.int64) << 16
+    current = samples[j].astype(np.float64)
+    previous = np.where((j > 0)[:, None], samples[np.maximum(j - 1, 0)], 0)
+    values = np.trunc(
+        (previous.astype(np.float64) * d + current * (out_rate - d)) / out_rate
+    )
+    return (values.astype(np.int64) >> 16).astype(np.int16)
+
+
+def _sync(
+    audio1: np.ndarray, sr1: int, audio2: np.ndarray, sr2: int
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Porta i due audio allo stesso numero di canali e sample rate (il maggiore)"""
+    channels = max(audio1.shape[1], audio2.shape[1])
+    sample_rate = max(sr1, sr2)
+    synced = []
+    for audio, sr in ((audio1, sr1), (audio2, sr2)):
+        if audio.shape[1] < channels:
+            audio = np.repeat(audio[:, :1], channels, axis=1)
+        synced.append(_ratecv(audio, sr, sample_rate))
+    return synced[0], synced[1], sample_rate
+
+
+def _linear_fade(
+    audio: np.ndarray, sample_rate: int, from_gain: float, to_gain: float
+) -> np.ndarray:
+    """
+    Fade lineare in ampiezza su tutto il segmento. Oltre 100 ms il gain
+    cambia una volta per millisecondo, altrimenti a ogni campione.
+    """
+    duration = _len_ms(audio, sample_rate)
+    from_power = _db_to_float(from_gain)
+    gain_delta = _db_to_float(to_gain) - from_power
+    frames_per_ms = sample_rate / 1000.0
+
+    if duration > 100:
+        # Un gain per millisecondo: chunk [int(i*k), int((i+1)*k)) con padding finale
+        scale_step = gain_delta / duration
+        bounds = (np.arange(duration + 1) * frames_per_ms).astype(np.int64)
+        starts = bounds[:-1]
+        lengths = np.where(starts < len(audio), bounds[1:] - starts, 0)
+        chunk_ids = np.repeat(np.arange(duration), lengths)
+        offsets = np.arange(len(chunk_ids)) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        source = starts[chunk_ids] + offsets
+        values = np.where(
+            (source < len(audio))[:, None],
+            audio[np.minimum(source, len(audio) - 1)],
+            0,
+        )
+        gains = (from_power + scale_step * np.arange(duration))[chunk_ids]
+        return _mul(values, gains[:, None])
+
+    fade_frames = duration * frames_per_ms
+    if fade_frames == 0:
+        return audio[:0]
+    scale_step = gain_delta / fade_frames
+    count = min(int(fade_frames), len(audio))
+    gains = from_power + scale_step * np.arange(count)
+    return _mul(audio[:count], gains[:, None])
+
+
+def _overlay_loop(audio: np.ndarray, overlay: np.ndarray) -> np.ndarray:
+    """Sovrappone overlay (ripetuto se più corto) per tutta la durata di audio"""
+    if len(overlay) == 0 or len(audio) == 0:
+        return audio
+    repeats = -(-len(audio) // len(overlay))
+    return _add(audio, np.tile(overlay, (repeats, 1))[: len(audio)])
 
 
 class ChimeraMaker:
@@ -22,90 +234,222 @@ class ChimeraMaker:
     def __init__(self):
         self.default_segment_duration_ms = 5000  # 5 secondi per segmento
         self.default_crossfade_ms = 100  # 100ms di crossfade
+        self.default_crossfade_curve = "linear"  # "linear" (storico) o "equal_power"
+        self.default_normalization = "rms"  # "rms" (storico) o "peak"
+        self.default_source_selection = SOURCE_SELECTION  # "speech" o "center"
+
+    def dbfs(self, audio: np.ndarray, method: str = "rms") -> float:
+        """Livello in dBFS (RMS intero come audioop.rms, oppure di picco)"""
+        if audio.size == 0:
+            return -math.inf
+        if method == "peak":
+            level = float(np.max(np.abs(audio.astype(np.int32))))
+        else:
+            # Somma dei quadrati esatta in int64 (campioni 16-bit)
+            sum_squares = float(np.sum(audio.astype(np.int64) ** 2))
+            level = float(int(math.sqrt(sum_squares / audio.size)))
+        if level == 0:
+            return -math.inf
+        return 20 * math.log(level / _PCM16_FULL_SCALE, 10)
 
     def normalize_volumes(
-        self, audio1: AudioSegment, audio2: AudioSegment
-    ) -> Tuple[AudioSegment, AudioSegment]:
+        self, audio1: np.ndarray, audio2: np.ndarray, method: str = "rms"
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
         Normalizza i volumi di due audio al livello più alto tra i due.
         Questo previene salti di volume nella giunzione.
 
         Args:
-            audio1: Primo segmento audio
-            audio2: Secondo segmento audio
+            audio1: Primo segmento audio (int16)
+            audio2: Secondo segmento audio (int16)
+            method: "rms" oppure "peak"
 
         Returns:
             Tuple con i due audio normalizzati
         """
-        # Calcola dBFS (decibel full scale) per trovare il volume più alto
-        max_dbfs = max(audio1.dBFS, audio2.dBFS)
-
-        # Normalizza entrambi a quel livello (con headroom di -1dB)
-        target_dbfs = max_dbfs - 1.0
+        level1 = self.dbfs(audio1, method)
+        level2 = self.dbfs(audio2, method)
 
-        audio1_normalized = audio1.apply_gain(target_dbfs - audio1.dBFS)
-        audio2_normalized = audio2.apply_gain(target_dbfs - audio2.dBFS)
+        # Normalizza entrambi al livello più alto (con headroom di -1dB)
+        target_dbfs = max(level1, level2) - 1.0
 
-        return audio1_normalized, audio2_normalized
+        normalized = []
+        for audio, level in ((audio1, level1), (audio2, level2)):
+            # Un segmento muto resta muto
+            if math.isinf(level):
+                normalized.append(audio)
+            else:
+                normalized.append(_mul(audio, _db_to_float(target_dbfs - level)))
+        return normalized[0], normalized[1]
 
     def extract_segment(
-        self, audio: AudioSegment, duration_ms: int, from_start: bool = True
-    ) -> AudioSegment:
+        self,
+        audio: np.ndarray,
+        sample_rate: int,
+        duration_ms: int,
+        from_start: bool = True,
+    ) -> np.ndarray:
         """
         Estrae un segmento di durata specifica dall'audio.
 
         Args:
-            audio: Audio sorgente
+            audio: Audio sorgente (int16, frame x canali)
+            sample_rate: Sample rate dell'audio
             duration_ms: Durata del segmento in millisecondi
             from_start: Se True estrae dall'inizio, altrimenti dalla fine
 
         Returns:
             Segmento estratto
         """
-        if len(audio) <= duration_ms:
+        if _len_ms(audio, sample_rate) <= duration_ms:
             return audio  # Se l'audio è già più corto, ritornalo intero
 
         if from_start:
-            return audio[:duration_ms]
+            return _slice_ms(audio, sample_rate, None, duration_ms)
         else:
-            return audio[-duration_ms:]
+            return _slice_ms(audio, sample_rate, -duration_ms, None)
+
+    def select_center_segment(
+        self, audio: np.ndarray, sample_rate: int, duration_ms: int
+    ) -> np.ndarray:
+        """Segmento centrale di duration_ms (l'audio intero se è più corto)"""
+        length = _len_ms(audio, sample_rate)
+        if length <= duration_ms:
+            return audio
+        start_pos = (length - duration_ms) // 2
+        return _slice_ms(audio, sample_rate, start_pos, start_pos + duration_ms)
+
+    def select_speech_segment(
+        self,
+        audio: np.ndarray,
+        sample_rate: int,
+        duration_ms: int,
+        min_duration_ms: int = 0,
+    ) -> Optional[np.ndarray]:
+        """
+        Finestra di al massimo duration_ms con più parlato, senza silenzi
+        iniziali/finali.
 
-    def create_hybrid_reference(
+        Returns:
+            Segmento estratto, oppure None se non c'è parlato o la finestra
+            non supera min_duration_ms
+        """
+        window = select_speech_window(
+            frame_energy_db(audio, sample_rate), duration_ms / 1000
+        )
+        if window is None:
+            return None
+        start_ms, end_ms = (int(round(t * 1000)) for t in window)
+        end_ms = min(end_ms, start_ms + duration_ms)
+        if end_ms - start_ms <= min_duration_ms:
+            return None
+        return _slice_ms(audio, sample_rate, start_ms, end_ms)
+
+    def crossfade(
         self,
-        source_audio_path: Path,
-        ai_audio_path: Path,
-        output_path: Path,
+        audio1: np.ndarray,
+        sr1: int,
+        audio2: np.ndarray,
+        sr2: int,
+        crossfade_ms: int,
+        curve: str = "linear",
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Unisce due audio con crossfade.
+
+        Args:
+            curve: "linear" (fade lineare in ampiezza fino a -120 dB, come la
+                pipeline storica) oppure "equal_power" (seno/coseno, potenza
+                costante nella giunzione)
+
+        Returns:
+            Tuple (audio int16, sample_rate)
+        """
+        if crossfade_ms > _len_ms(audio1, sr1):
+            raise ValueError("Crossfade più lungo del primo segmento")
+        if crossfade_ms > _len_ms(audio2, sr2):
+            raise ValueError("Crossfade più lungo del secondo segmento")
+
+        audio1, audio2, sample_rate = _sync(audio1, sr1, audio2, sr2)
+        if not crossfade_ms:
+            return np.concatenate([audio1, audio2]), sample_rate
+
+        head = _slice_ms(audio1, sample_rate, None, -crossfade_ms)
+        tail = _slice_ms(audio2, sample_rate, crossfade_ms, None)
+
+        if curve == "equal_power":
+            fade_frames = min(
+                int(crossfade_ms * (sample_rate / 1000.0)), len(audio1), len(audio2)
+            )
+            t = (np.arange(fade_frames) + 0.5) / fade_frames * (np.pi / 2)
+            mixed = audio1[len(audio1) - fade_frames :] * np.cos(t)[:, None] + audio2[
+                :fade_frames
+            ] * np.sin(t)[:, None]
+            joint = np.clip(np.rint(mixed), _PCM16_MIN, _PCM16_MAX).astype(np.int16)
+            head = audio1[: len(audio1) - fade_frames]
+            tail = audio2[fade_frames:]
+        elif curve == "linear":
+            fade_out = _linear_fade(
+                _slice_ms(audio1, sample_rate, -crossfade_ms, None),
+                sample_rate,
+                0.0,
+                _SILENCE_GAIN_DB,
+            )
+            fade_in = _linear_fade(
+                _slice_ms(audio2, sample_rate, None, crossfade_ms),
+                sample_rate,
+                _SILENCE_GAIN_DB,
+                0.0,
+            )
+            joint = _overlay_loop(_slice_ms(fade_out, sample_rate), fade_in)
+        else:
+            raise ValueError(f"Curva di crossfade '{curve}' non supportata")
+
+        return np.concatenate([head, joint, tail]), sample_rate
+
+    def create_hybrid_array(
+        self,
+        source_audio: np.ndarray,
+        source_sr: int,
+        ai_audio: np.ndarray,
+        ai_sr: int,
         segment_duration_ms: Optional[int] = None,
         crossfade_ms: Optional[int] = None,
-    ) -> Path:
+        crossfade_curve: Optional[str] = None,
+        normalization: Optional[str] = None,
+        source_selection: Optional[str] = None,
+    ) -> Tuple[np.ndarray, int]:
         """
-        Crea un file audio ibrido "Chimera" unendo due sorgenti.
+        Crea l'audio chimera in memoria da due array PCM 16-bit.
 
         Args:
-            source_audio_path: Path dell'audio neutro dell'utente
-            ai_audio_path: Path dell'audio emotivo generato dall'AI
-            output_path: Path dove salvare il file chimera
+            source_audio: Audio neutro dell'utente (int16, frame x canali)
+            source_sr: Sample rate dell'audio utente
+            ai_audio: Audio emotivo generato dall'AI (int16, frame x canali)
+            ai_sr: Sample rate dell'audio AI
             segment_duration_ms: Durata di ogni segmento (default: 5000ms)
             crossfade_ms: Durata del crossfade (default: 100ms)
+            crossfade_curve: "linear" o "equal_power" (default: linear)
+            normalization: "rms" o "peak" (default: rms)
+            source_selection: "speech" o "center" (default: QWENTTS_CHIMERA_SOURCE_SEGMENT)
 
         Returns:
-            Path del file chimera generato
+            Tuple (audio chimera int16, sample_rate)
 
         Raises:
-            FileNotFoundError: Se i file sorgente non esistono
             ValueError: Se i parametri sono invalidi
         """
-        # Valida esistenza file
-        if not source_audio_path.exists():
-            raise FileNotFoundError(f"Audio sorgente non trovato: {source_audio_path}")
-        if not ai_audio_path.exists():
-            raise FileNotFoundError(f"Audio AI non trovato: {ai_audio_path}")
-
         # Usa valori di default se non specificati
         if segment_duration_ms is None:
             segment_duration_ms = self.default_segment_duration_ms
         if crossfade_ms is None:
             crossfade_ms = self.default_crossfade_ms
+        if crossfade_curve is None:
+            crossfade_curve = self.default_crossfade_curve
+        if normalization is None:
+            normalization = self.default_normalization
+        if source_selection is None:
+            source_selection = self.default_source_selection
 
         # Validazione parametri
         if segment_duration_ms <= 0:
@@ -114,45 +458,84 @@ class ChimeraMaker:
             raise ValueError("crossfade_ms deve essere >= 0")
         if crossfade_ms >= segment_duration_ms:
             raise ValueError("crossfade_ms deve essere < segment_duration_ms")
-
-        # Carica gli audio
-        source_audio = AudioSegment.from_file(str(source_audio_path))
-        ai_audio = AudioSegment.from_file(str(ai_audio_path))
-
-        # Estrai segmenti della durata desiderata
-        # Per l'audio utente: prendi dall'inizio o dal centro se è lungo
-        if len(source_audio) > segment_duration_ms:
-            # Se l'audio è lungo, prendi dal centro per evitare silenzi iniziali/finali
-            start_pos = (len(source_audio) - segment_duration_ms) // 2
-            source_segment = source_audio[start_pos : start_pos + segment_duration_ms]
-        else:
-            source_segment = source_audio
+        if source_selection not in ("speech", "center"):
+            raise ValueError(f"Selezione del segmento '{source_selection}' non supportata")
+
+        # Per l'audio utente: finestra di parlato più densa (VAD) oppure centro
+        source_segment = None
+        if source_selection == "speech":
+            source_segment = self.select_speech_segment(
+                source_audio, source_sr, segment_duration_ms, crossfade_ms
+            )
+        if source_segment is None:
+            source_segment = self.select_center_segment(
+                source_audio, source_sr, segment_duration_ms
+            )
 
         # Per l'audio AI: prendi dall'inizio (dovrebbe essere già ottimale)
         ai_segment = self.extract_segment(
-            ai_audio, segment_duration_ms, from_start=True
+            ai_audio, ai_sr, segment_duration_ms, from_start=True
         )
 
         # Normalizza i volumi
-        source_segment, ai_segment = self.normalize_volumes(source_segment, ai_segment)
+        source_segment, ai_segment = self.normalize_volumes(
+            source_segment, ai_segment, normalization
+        )
 
         # Unisci con crossfade
-        if crossfade_ms > 0:
-            hybrid = source_segment.append(ai_segment, crossfade=crossfade_ms)
-        else:
-            hybrid = source_segment + ai_segment
+        return self.crossfade(
+            source_segment, source_sr, ai_segment, ai_sr, crossfade_ms, crossfade_curve
+        )
 
-        # Assicura che la directory di output esista
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+    def create_hybrid_reference(
+        self,
+        source_audio_path: Path,
+        ai_audio_path: Path,
+        output_path: Path,
+        segment_duration_ms: Optional[int] = None,
+        crossfade_ms: Optional[int] = None,
+        crossfade_curve: Optional[str] = None,
+        normalization: Optional[str] = None,
+    ) -> Path:
+        """
+        Crea un file audio ibrido "Chimera" unendo due sorgenti.
 
-        # Esporta come WAV
-        hybrid.export(
-            str(output_path),
-            format="wav",
-            parameters=["-acodec", "pcm_s16le"],  # PCM 16-bit for compatibility
-        )
+        Args:
+            source_audio_path: Path dell'audio neutro dell'utente
+            ai_audio_path: Path dell'audio emotivo generato dall'AI
+            output_path: Path dove salvare il file chimera
+            segment_duration_ms: Durata di ogni segmento (default: 5000ms)
+            crossfade_ms: Durata del crossfade (default: 100ms)
+            crossfade_curve: "linear" o "equal_power" (default: linear)
+            normalization: "rms" o "peak" (default: rms)
 
-        return output_path
+        Returns:
+            Path del file chimera generato
+
+        Raises:
+            FileNotFoundError: Se i file sorgente non esistono
+            ValueError: Se i parametri sono invalidi
+        """
+        # Valida esistenza file
+        if not source_audio_path.exists():
+            raise FileNotFoundError(f"Audio sorgente non trovato: {source_audio_path}")
+        if not ai_audio_path.exists():
+            raise FileNotFoundError(f"Audio AI non trovato: {ai_audio_path}")
+
+        source_audio, source_sr = load_pcm16(source_audio_path)
+        ai_audio, ai_sr = load_pcm16(ai_audio_path)
+
+        hybrid, sample_rate = self.create_hybrid_array(
+            source_audio,
+            source_sr,
+            ai_audio,
+            ai_sr,
+            segment_duration_ms,
+            crossfade_ms,
+            crossfade_curve,
+            normalization,
+        )
+        return write_pcm16(output_path, hybrid, sample_rate)
 
     def create_from_numpy(
         self,
@@ -162,49 +545,35 @@ class ChimeraMaker:
         output_path: Path,
         segment_duration_ms: Optional[int] = None,
         crossfade_ms: Optional[int] = None,
+        ai_sample_rate: Optional[int] = None,
+        crossfade_curve: Optional[str] = None,
+        normalization: Optional[str] = None,
     ) -> Path:
         """
         Crea un audio chimera da array numpy (utile per output diretto dei modelli).
 
         Args:
-            source_array: Array numpy dell'audio neutro
-            ai_array: Array numpy dell'audio AI emotivo
-            sample_rate: Sample rate degli audio
+            source_array: Array numpy dell'audio neutro (float o int16)
+            ai_array: Array numpy dell'audio AI emotivo (float o int16)
+            sample_rate: Sample rate dell'audio neutro
             output_path: Path di output
             segment_duration_ms: Durata segmenti
             crossfade_ms: Durata crossfade
+            ai_sample_rate: Sample rate dell'audio AI (default: sample_rate)
+            crossfade_curve: "linear" o "equal_power" (default: linear)
+            normalization: "rms" o "peak" (default: rms)
 
         Returns:
             Path del file generato
         """
-        import tempfile
-
-        # Salva temporaneamente come file WAV
-        with tempfile.NamedTemporaryFile(
-            suffix="_source.wav", delete=False
-        ) as tmp_source:
-            source_temp = Path(tmp_source.name)
-            sf.write(str(source_temp), source_array, sample_rate)
-
-        with tempfile.NamedTemporaryFile(suffix="_ai.wav", delete=False) as tmp_ai:
-            ai_temp = Path(tmp_ai.name)
-            sf.write(str(ai_temp), ai_array, sample_rate)
-
-        try:
-            # Usa il metodo principale
-            result = self.create_hybrid_reference(
-                source_temp,
-                ai_temp,
-                output_path,
-                segment_duration_ms,
-                crossfade_ms,
-            )
-        finally:
-            # Pulizia file temporanei
-            try:
-                source_temp.unlink()
-                ai_temp.unlink()
-            except Exception:
-                pass
-
-        return result
+        hybrid, hybrid_sr = self.create_hybrid_array(
+            to_pcm16(source_array),
+            sample_rate,
+            to_pcm16(ai_array),
+            ai_sample_rate or sample_rate,
+            segment_duration_ms,
+            crossfade_ms,
+            crossfade_curve,
+            normalization,
+        )
+        return write_pcm16(output_path, hybrid, hybrid_sr)
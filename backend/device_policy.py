@@ -0,0 +1,167 @@
+"""
+Device Policy Module - Scelta di device, dtype e attention per i modelli TTS
+
+Centralizza le decisioni che prima erano cablate in load_model
+(cuda:0, bfloat16, eager):
+- device: CUDA se disponibile, altrimenti CPU (o forzato via env)
+- dtype: bf16/fp16/fp32 (default bf16 su GPU, fp32 su CPU)
+- attention: SDPA dove disponibile, con fallback a eager
+- thread intra-op / inter-op di PyTorch per i nodi solo CPU
+- throughput misurato per device (token/s, real-time factor)
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+import torch
+
+# Device dei modelli TTS: "auto", "cpu", "cuda" oppure "cuda:N"
+TTS_DEVICE = os.environ.get("QWENTTS_DEVICE", "auto").lower()
+# Precisione dei pesi: "auto", "bf16", "fp16" oppure "fp32"
+TTS_DTYPE = os.environ.get("QWENTTS_DTYPE", "auto").lower()
+# Implementazione dell'attention: "auto" (SDPA se disponibile), "sdpa", "eager", ...
+TTS_ATTENTION = os.environ.get("QWENTTS_ATTENTION", "auto").lower()
+# Thread intra-op di PyTorch (0 = default di PyTorch)
+CPU_THREADS = int(os.environ.get("QWENTTS_CPU_THREADS", "0"))
+# Thread inter-op di PyTorch (0 = default di PyTorch)
+CPU_INTEROP_THREADS = int(os.environ.get("QWENTTS_CPU_INTEROP_THREADS", "0"))
+
+_DTYPES = {
+    "bf16": torch.bfloat16,
+    "bfloat16": torch.bfloat16,
+    "fp16": torch.float16,
+    "float16": torch.float16,
+    "fp32": torch.float32,
+    "float32": torch.float32,
+}
+
+
+class DevicePolicy:
+    """Risolve device/dtype/attention e raccoglie le metriche di throughput"""
+
+    def __init__(
+        self,
+        device: str = TTS_DEVICE,
+        dtype: str = TTS_DTYPE,
+        attention: str = TTS_ATTENTION,
+        threads: int = CPU_THREADS,
+        interop_threads: int = CPU_INTEROP_THREADS,
+    ):
+        """
+        Args:
+            device: "auto", "cpu", "cuda" o "cuda:N"
+            dtype: "auto", "bf16", "fp16" o "fp32"
+            attention: "auto" oppure un valore di attn_implementation
+            threads: Thread intra-op (0 = default)
+            interop_threads: Thread inter-op (0 = default)
+        """
+        if device == "auto":
+            device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        elif device == "cuda":
+            device = "cuda:0"
+        if device.startswith("cuda") and not torch.cuda.is_available():
+            print(f"Device '{device}' richiesto ma CUDA non disponibile: uso la CPU")
+            device = "cpu"
+        self.device = device
+
+        if dtype == "auto":
+            # Su CPU bf16 è lento senza supporto hardware: fp32 è la scelta sicura
+            dtype = "bf16" if self.is_cuda else "fp32"
+        if dtype not in _DTYPES:
+            raise ValueError(f"Dtype '{dtype}' non supportato")
+        self.dtype = _DTYPES[dtype]
+
+        if attention == "auto":
+            attention = (
+                "sdpa"
+                if hasattr(torch.nn.functional, "scaled_dot_product_attention")
+                else "eager"
+            )
+        self.attention = attention
+
+        self._configure_threads(threads, interop_threads)
+
+        self._stats_lock = threading.Lock()
+        # variante del modello (es. "base", "base:int8") -> {generations, frames, decode_seconds}
+        self._throughput: Dict[str, dict] = {}
+
+    @property
+    def is_cuda(self) -> bool:
+        return self.device.startswith("cuda")
+
+    @property
+    def device_index(self) -> int:
+        return int(self.device.split(":")[1]) if ":" in self.device else 0
+
+    def _configure_threads(self, threads: int, interop_threads: int):
+        """Applica il numero di thread di PyTorch (va fatto prima dell'inferenza)"""
+        if threads > 0:
+            torch.set_num_threads(threads)
+        if interop_threads > 0:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError as e:
+                # Possibile solo prima che parta il primo lavoro parallelo
+                print(f"Thread inter-op non modificabili: {e}")
+
+    def load_kwargs(
+        self, attention: Optional[str] = None, dtype: Optional[torch.dtype] = None
+    ) -> dict:
+        """Argomenti di from_pretrained per questa policy (con override opzionali)"""
+        return {
+            "device_map": self.device,
+            "dtype": dtype or self.dtype,
+            "attn_implementation": attention or self.attention,
+        }
+
+    def total_memory(self) -> Optional[int]:
+        """Memoria totale del device in byte (None su CPU)"""
+        if not self.is_cuda:
+            return None
+        return torch.cuda.get_device_properties(self.device_index).total_memory
+
+    def memory_allocated(self) -> int:
+        """Byte allocati da PyTorch sul device (0 su CPU)"""
+        if not self.is_cuda:
+            return 0
+        return torch.cuda.memory_allocated(self.device_index)
+
+    def empty_cache(self):
+        """Rilascia la memoria cache dell'allocatore CUDA (no-op su CPU)"""
+        if self.is_cuda:
+            torch.cuda.empty_cache()
+            torch.cuda.synchronize()
+
+    def record_decode(self, model_type: str, frames: int, seconds: float):
+        """Registra una generazione (frame codec prodotti e tempo di decodifica)"""
+        if frames <= 0 or seconds <= 0:
+            return
+        with self._stats_lock:
+            stats = self._throughput.setdefault(
+                model_type, {"generations": 0, "frames": 0, "decode_seconds": 0.0}
+            )
+            stats["generations"] += 1
+            stats["frames"] += frames
+            stats["decode_seconds"] += seconds
+
+    def get_status(self, codec_frame_rate: float) -> dict:
+        """Configurazione del device e throughput medio per modello"""
+        with self._stats_lock:
+            throughput = {}
+            for model_type, stats in self._throughput.items():
+                audio_seconds = stats["frames"] / codec_frame_rate
+                throughput[model_type] = {
+                    "generations": stats["generations"],
+                    "tokens_per_sec": round(stats["frames"] / stats["decode_seconds"], 1),
+                    # < 1: più veloce del tempo reale
+                    "real_time_factor": round(stats["decode_seconds"] / audio_seconds, 3),
+                }
+        return {
+            "device": self.device,
+            "dtype": str(self.dtype).replace("torch.", ""),
+            "attention": self.attention,
+            "threads": torch.get_num_threads(),
+            "interop_threads": torch.get_num_interop_threads(),
+            "throughput": throughput,
+        }
@@ -0,0 +1,214 @@
+"""
+Long-Form Module - Sintesi di documenti lunghi con checkpoint e ripresa
+
+Un testo lungo (capitolo, audiolibro) viene diviso in chunk ai confini di
+paragrafo/frase, mantenendo i tag emotivi delle personalità. Ogni chunk
+sintetizzato viene salvato in una directory di checkpoint insieme a un
+manifest: se il processo si interrompe, la stessa richiesta riprende
+dall'ultimo chunk completato. L'output finale viene cucito in streaming,
+un chunk alla volta, senza caricare tutto l'audio in memoria.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+import soundfile as sf
+
+# Lunghezza massima (caratteri) di un chunk long-form
+LONGFORM_CHUNK_CHARS = int(os.environ.get("QWENTTS_LONGFORM_CHUNK_CHARS", "600"))
+
+
+class LongFormRunner:
+    """Esegue job long-form a chunk con checkpoint su disco"""
+
+    def __init__(self, root_dir: Path, output_dir: Path, scheduler, output_cache):
+        """
+        Args:
+            root_dir: Directory dei checkpoint (una sottocartella per job)
+            output_dir: Directory dove scrivere l'audio finale
+            scheduler: JobScheduler su cui eseguire la sintesi dei chunk
+            output_cache: OutputCache dove registrare l'audio finale
+        """
+        self.root_dir = root_dir
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.output_dir = output_dir
+        self.scheduler = scheduler
+        self.output_cache = output_cache
+
+    def job_fingerprint(self, params: dict, audio_format: str) -> str:
+        """Fingerprint del job: distinto da quello di una generazione in un colpo"""
+        base = self.output_cache.fingerprint(params, audio_format)
+        return hashlib.sha256(f"longform:{base}".encode("utf-8")).hexdigest()
+
+    def split_chunks(self, params: dict, max_chars: int = None) -> List[str]:
+        """
+        Divide il testo in chunk ai confini di paragrafo e frase.
+        Le frasi di uno stesso paragrafo vengono accorpate fino a max_chars;
+        in modalità personalità ogni chunk porta il proprio tag emotivo.
+        """
+        if max_chars is None:
+            max_chars = LONGFORM_CHUNK_CHARS
+        manager = self.scheduler.manager
+
+        text = params["text"]
+        if params.get("personality_config"):
+            segments = manager._parse_tagged_text(text)
+        else:
+            segments = [(None, text)]
+
+        chunks = []
+        for tag, segment_text in segments:
+            prefix = f"[{tag}] " if tag else ""
+            for paragraph in re.split(r"\n\s*\n", segment_text):
+                current = ""
+                for sentence in manager._split_sentences(paragraph, max_chars):
+                    if current and len(current) + len(sentence) + 1 > max_chars:
+                        chunks.append(prefix + current)
+                        current = sentence
+                    else:
+                        current = f"{current} {sentence}".strip()
+                if current:
+                    chunks.append(prefix + current)
+        return chunks
+
+    def _read_manifest(self, job_dir: Path) -> Optional[dict]:
+        manifest_path = job_dir / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Manifest long-form illeggibile in {job_dir.name}: {e}")
+            return None
+
+    def _write_manifest(self, job_dir: Path, manifest: dict):
+        # Scrittura atomica: un crash non lascia un manifest troncato
+        tmp_path = job_dir / "manifest.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, job_dir / "manifest.json")
+
+    def run(self, params: dict, audio_format: str, fingerprint: str, channel) -> str:
+        """
+        Esegue (o riprende) un job long-form e ritorna il nome del file finale.
+
+        Args:
+            params: Parametri di generazione (con personality_config se serve)
+            audio_format: "wav" oppure "mp3"
+            fingerprint: Fingerprint del job (vedi job_fingerprint)
+            channel: ProgressChannel su cui pubblicare l'avanzamento
+        """
+        job_dir = self.root_dir / fingerprint
+        job_dir.mkdir(parents=True, exist_ok=True)
+
+        manifest = self._read_manifest(job_dir)
+        if manifest is None:
+            manifest = {
+                "job_id": fingerprint,
+                "created_at": time.time(),
+                "format": audio_format,
+                "params": {k: v for k, v in params.items() if k != "text"},
+                "text": params["text"],
+                "chunks": self.split_chunks(params),
+                "completed": 0,
+                "sample_rate": None,
+            }
+            self._write_manifest(job_dir, manifest)
+
+        chunks = manifest["chunks"]
+        total = len(chunks)
+        if total == 0:
+            raise ValueError("Testo vuoto")
+
+        if manifest["completed"] > 0:
+            channel.update(
+                stage=f"Ripresa dal chunk {manifest['completed'] + 1}/{total}...",
+                job_id=fingerprint,
+            )
+
+        model_type = params.get("expected_model")
+        for index in range(manifest["completed"], total):
+            chunk_path = job_dir / f"chunk_{index:05d}.wav"
+
+            def on_decode_progress(info: dict, index=index):
+                channel.update(
+                    progress=int((index + info["fraction"]) / total * 95),
+                    stage=f"Sintesi chunk {index + 1}/{total}...",
+                    tokens_per_sec=info["tokens_per_sec"],
+                    audio_seconds=info["audio_seconds"],
+                )
+
+            # Un job per chunk: le altre richieste possono alternarsi nella coda
+            chunk_params = {**params, "text": chunks[index]}
+            job = self.scheduler.submit(
+                model_type,
+                lambda m, p=chunk_params, cb=on_decode_progress: m.generate(
+                    p, progress_callback=cb
+                ),
+            )
+            wavs, sr = job.result()
+
+            tmp_path = job_dir / f"chunk_{index:05d}.tmp.wav"
+            sf.write(str(tmp_path), wavs[0], sr, subtype="FLOAT")
+            os.replace(tmp_path, chunk_path)
+
+            manifest["completed"] = index + 1
+            manifest["sample_rate"] = sr
+            self._write_manifest(job_dir, manifest)
+            channel.update(
+                progress=int((index + 1) / total * 95),
+                stage=f"Chunk {index + 1}/{total} completato",
+            )
+
+        channel.update(progress=96, stage="Unione dei chunk...")
+        filename = self._stitch(job_dir, manifest, audio_format, fingerprint)
+
+        # Output salvato: i checkpoint non servono più
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return filename
+
+    def _stitch(
+        self, job_dir: Path, manifest: dict, audio_format: str, fingerprint: str
+    ) -> str:
+        """Cuce i chunk nel file finale leggendone uno alla volta"""
+        wav_path = self.output_dir / f"{uuid.uuid4().hex}.wav"
+
+        with sf.SoundFile(
+            str(wav_path),
+            "w",
+            samplerate=manifest["sample_rate"],
+            channels=1,
+            subtype="PCM_16",
+        ) as out:
+            for index in range(len(manifest["chunks"])):
+                data, _ = sf.read(str(job_dir / f"chunk_{index:05d}.wav"), dtype="float32")
+                out.write(data)
+
+        # Senza seed l'output è una take unica: niente cache
+        if not self.output_cache.cacheable(manifest["params"]):
+            fingerprint = None
+        return self.output_cache.publish(wav_path, audio_format, fingerprint)
+
+    def load_manifest(self, job_id: str) -> Optional[dict]:
+        """Manifest di un job per id (None se l'id non è valido o non esiste)"""
+        if not re.fullmatch(r"[0-9a-f]{64}", job_id or ""):
+            return None
+        return self._read_manifest(self.root_dir / job_id)
+
+    def pending_jobs(self) -> List[dict]:
+        """Manifest dei job interrotti (con chunk ancora da sintetizzare)"""
+        pending = []
+        for job_dir in self.root_dir.iterdir():
+            if job_dir.is_dir():
+                manifest = self._read_manifest(job_dir)
+                if manifest is not None:
+                    pending.append(manifest)
+        return pending
@@ -1,15 +1,139 @@
 import torch
-import soundfile as sf
 import numpy as np
-import whisper
 import librosa
 import re
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from qwen_tts import Qwen3TTSModel
 from pathlib import Path
 
+from asr_manager import ASRManager
+from audio_io import audio_duration, read_audio_range
+from cache_utils import LRUCache, file_content_hash
+from device_policy import DevicePolicy
+from model_snapshot import MODEL_SNAPSHOTS, SnapshotStore
+from quantization import (
+    QUANTIZATION,
+    QUANTIZATION_MODES,
+    QuantizedModelCache,
+    quantize_dynamic_int8,
+    state_nbytes,
+)
+from speech_window import REF_WINDOW_SECONDS, SpeechWindowAnalyzer
 
 import gc
 
+# Budget di memoria per la cache dei prompt di clonazione (MB)
+REF_PROMPT_CACHE_MB = int(os.environ.get("QWENTTS_REF_PROMPT_CACHE_MB", "512"))
+# Numero massimo di segmenti taggati generati in un'unica chiamata batch
+SEGMENT_BATCH_SIZE = int(os.environ.get("QWENTTS_SEGMENT_BATCH_SIZE", "8"))
+# Budget di memoria per la cache dei segmenti audio già sintetizzati (MB)
+SEGMENT_CACHE_MB = int(os.environ.get("QWENTTS_SEGMENT_CACHE_MB", "256"))
+# Budget di memoria per i riferimenti di clonazione manuale già tagliati/normalizzati (MB)
+CLONE_REF_CACHE_MB = int(os.environ.get("QWENTTS_CLONE_REF_CACHE_MB", "128"))
+# Budget del pool di modelli residenti in GB (vuoto = automatico in base al device)
+MODEL_POOL_BUDGET_GB = os.environ.get("QWENTTS_MODEL_POOL_BUDGET_GB", "")
+# Politica di eviction del pool: "lru" oppure "cost" (tiene i modelli più lenti da ricaricare)
+MODEL_EVICTION_POLICY = os.environ.get("QWENTTS_MODEL_EVICTION", "lru").lower()
+# Lunghezza massima (caratteri) di un chunk in streaming incrementale
+STREAM_CHUNK_MAX_CHARS = int(os.environ.get("QWENTTS_STREAM_CHUNK_MAX_CHARS", "300"))
+
+# Prompt VoiceDesign per le guide emotive delle Smart Personality
+EMOTION_PROMPTS = {
+    "rabbia": "parlando con estrema rabbia e frustrazione, voce alta e concitata",
+    "felicità": "parlando con grande gioia ed entusiasmo, tono allegro e vivace",
+    "paura": "parlando con paura e timore, voce tremante e incerta",
+    "tristezza": "parlando con profonda tristezza e malinconia, voce bassa e lenta",
+    "sorpresa": "parlando con grande sorpresa e stupore, tono esclamativo",
+    "neutro": "parlando con tono neutro e naturale",
+}
+
+# Frame codec generati per secondo di audio (tokenizer Qwen3-TTS 12Hz)
+CODEC_FRAME_RATE = 12.0
+# Caratteri di testo pronunciati mediamente in un secondo (stima iniziale per l'ETA)
+CHARS_PER_AUDIO_SECOND = 14.0
+# Intervallo minimo tra due notifiche di progresso (secondi)
+PROGRESS_INTERVAL_SECONDS = 0.25
+
+
+def _default_pool_budget(policy: DevicePolicy) -> int:
+    """Budget automatico: 75% della VRAM se si usa CUDA, altrimenti metà della RAM"""
+    total_memory = policy.total_memory()
+    if total_memory:
+        return int(total_memory * 0.75)
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.5)
+    except (ValueError, OSError, AttributeError):
+        return 16 * 1024**3
+
+
+def _module_nbytes(model) -> int:
+    """Byte occupati da parametri e buffer del modello (wrapper Qwen o nn.Module)"""
+    module = getattr(model, "model", model)
+    if not isinstance(module, torch.nn.Module):
+        return 0
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.element_size() * t.nelement() for t in tensors)
+
+
+class DecodeMonitor:
+    """
+    Misura il progresso reale del loop di decodifica del modello.
+
+    Registra un forward hook sul talker (un forward = un frame codec per
+    ogni sequenza del batch) e notifica periodicamente una callback con
+    frame generati, token/s, secondi di audio prodotti ed ETA.
+    """
+
+    def __init__(self, model, text_chars: int, callback=None):
+        self.callback = callback
+        self.streams = 1  # Sequenze decodificate in parallelo (batch)
+        self.frames = 0
+        self.expected_frames = max(
+            1.0, text_chars / CHARS_PER_AUDIO_SECOND * CODEC_FRAME_RATE
+        )
+        self.start_time = time.time()
+        self._last_notify = 0.0
+        self._handle = None
+
+        # Qwen3TTSModel -> Qwen3TTSForConditionalGeneration -> talker
+        module = getattr(model, "model", model)
+        talker = getattr(module, "talker", None)
+        if isinstance(talker, torch.nn.Module):
+            self._handle = talker.register_forward_hook(self._on_step)
+
+    def _on_step(self, module, inputs, output):
+        self.frames += self.streams
+        now = time.time()
+        if self.callback is not None and now - self._last_notify >= PROGRESS_INTERVAL_SECONDS:
+            self._last_notify = now
+            self.callback(self.snapshot())
+
+    def snapshot(self) -> dict:
+        """Ritorna le metriche correnti di decodifica"""
+        elapsed = max(1e-6, time.time() - self.start_time)
+        tokens_per_sec = self.frames / elapsed
+        # Se la stima iniziale è superata, la si sposta in avanti
+        expected = max(self.expected_frames, self.frames * 1.1)
+        remaining = expected - self.frames
+        return {
+            "frames": self.frames,
+            "tokens_per_sec": round(tokens_per_sec, 1),
+            "audio_seconds": round(self.frames / CODEC_FRAME_RATE, 2),
+            "elapsed": round(elapsed, 2),
+            "eta": round(remaining / tokens_per_sec, 1) if tokens_per_sec > 0 else None,
+            "fraction": min(0.99, self.frames / expected),
+        }
+
+    def close(self):
+        """Rimuove l'hook dal modello"""
+        if self._handle is not None:
+            self._handle.remove()
+            self._handle = None
+
 
 class ModelManager:
     _instance = None
@@ -27,123 +151,439 @@ class ModelManager:
         self.current_model_type = None
         self.models_dir = Path(__file__).parent.parent / "models"
         self._initialized = True
-        self.whisper_model = None
-
-    def unload_model(self):
-        """Scarica il modello corrente e libera VRAM"""
-        if self.current_model is not None:
-            del self.current_model
-            self.current_model = None
-            self.current_model_type = None
+        # Trascrizione su sottosistema dedicato; su GPU la sua memoria conta nel pool
+        self.asr = ASRManager(reserve_memory=self._reserve_for_asr)
+        # Cache dei prompt di clonazione: (personalità, tag, hash file, ref_text) -> prompt
+        self.ref_prompt_cache = LRUCache(max_bytes=REF_PROMPT_CACHE_MB * 1024**2)
+        # Cache delle frasi già sintetizzate nelle personalità: chiave -> (wav, sr)
+        self.segment_cache = LRUCache(max_bytes=SEGMENT_CACHE_MB * 1024**2)
+        # Riferimenti di clonazione manuale: (hash file, start, end) -> (array, sr)
+        self.clone_reference_cache = LRUCache(max_bytes=CLONE_REF_CACHE_MB * 1024**2)
+        # Finestre di parlato (VAD) dei riferimenti senza intervallo esplicito
+        self.speech_windows = SpeechWindowAnalyzer()
+        # Device, dtype, attention e thread dei modelli TTS
+        self.device_policy = DevicePolicy()
+        # Quantizzazione di default dei modelli ("" = nessuna) e cache su disco
+        self.quantization = QUANTIZATION or None
+        self.quantized_cache = QuantizedModelCache(self.models_dir / ".quantized")
+        # Snapshot dei pesi già nel dtype target, caricati in mmap
+        self.snapshots = (
+            SnapshotStore(self.models_dir / ".snapshots") if MODEL_SNAPSHOTS else None
+        )
+        # Tempi di caricamento per variante: primo caricamento (cold) e successivi (warm)
+        self.load_stats = {}
+        # Pool dei modelli residenti: tipo -> info, in ordine LRU (ultimo = più recente)
+        self.resident_models = OrderedDict()
+        self.pool_budget_bytes = (
+            int(float(MODEL_POOL_BUDGET_GB) * 1024**3)
+            if MODEL_POOL_BUDGET_GB
+            else _default_pool_budget(self.device_policy)
+        )
+        # Footprint misurati in precedenza, usati come stima per i ricaricamenti
+        self._footprint_hints = {}
+        self._pool_lock = threading.RLock()
+        # Monitor del loop di decodifica della generazione in corso
+        self._decode_monitor = None
+
+    def _asr_shares_device(self) -> bool:
+        return self.asr.on_gpu and self.device_policy.is_cuda
+
+    def _pool_used_bytes(self) -> int:
+        used = sum(info["footprint_bytes"] for info in self.resident_models.values())
+        # Whisper sulla stessa GPU occupa lo stesso budget
+        if self._asr_shares_device():
+            used += self.asr.memory_bytes()
+        return used
+
+    def _reserve_for_asr(self, needed: int):
+        """
+        Libera spazio nel pool prima di caricare Whisper sulla GPU dei modelli
+        TTS. Il modello attivo non viene mai scaricato: potrebbe essere in uso
+        sul worker mentre la trascrizione gira su un altro thread.
+        """
+        if not self._asr_shares_device():
+            return
+        with self._pool_lock:
+            while (
+                self.resident_models
+                and self._pool_used_bytes() + needed > self.pool_budget_bytes
+            ):
+                victim = self._pick_victim()
+                if victim == self.current_model_type:
+                    break
+                self.unload_model(victim)
+
+    def _pick_victim(self) -> str:
+        """Sceglie il modello residente da evictare secondo la politica configurata"""
+        if MODEL_EVICTION_POLICY == "cost":
+            # Costo di ricaricamento per byte liberato, pesato per la frequenza d'uso
+            def cost(model_type):
+                info = self.resident_models[model_type]
+                return (
+                    info["load_seconds"]
+                    * (1 + info["uses"])
+                    / max(1, info["footprint_bytes"])
+                )
+
+            return min(self.resident_models, key=cost)
+        # LRU: il primo dell'OrderedDict è il meno usato di recente
+        return next(iter(self.resident_models))
+
+    def unload_model(self, model_type: str = None):
+        """Scarica un modello residente (default: quello attivo) e libera VRAM"""
+        with self._pool_lock:
+            if model_type is None:
+                model_type = self.current_model_type
+            info = self.resident_models.pop(model_type, None)
+            if info is None:
+                return
+
+            # I prompt in cache contengono tensori sul device del modello Base
+            if model_type == "base":
+                self.ref_prompt_cache.clear()
+            if self.current_model_type == model_type:
+                self.current_model = None
+                self.current_model_type = None
+            del info
             gc.collect()
-            torch.cuda.empty_cache()
-            torch.cuda.empty_cache()
-            torch.cuda.synchronize()
-
-    def load_whisper(self):
-        """Carica il modello Whisper per la trascrizione"""
-        if self.whisper_model is None:
-            # Usa 'base' che è un buon compromesso. Carica su CPU se VRAM è scarsa,
-            # ma useremo CUDA se disponibile e abbiamo spazio, altrimenti CPU.
-            # Data la 2070 8GB, e QwenTTS che ne usa parecchia, forse meglio caricare/scaricare on-demand
-            # o tenere su CPU. Proviamo su CUDA ma con lazy loading.
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.whisper_model = whisper.load_model("base", device=device)
+            self.device_policy.empty_cache()
 
     def transcribe_audio(self, file_path, start=None, end=None):
-        """Trascrive l'audio usando Whisper"""
-        self.load_whisper()
-
-        # Carica audio e taglia se necessario
-        y, sr = librosa.load(file_path, sr=16000)
-
-        if start is not None:
-            start_sample = int(start * sr)
-            end_sample = int(end * sr) if end is not None else len(y)
-            y = y[start_sample:end_sample]
-
-        # Whisper vuole float32
-        y = y.astype(np.float32)
+        """Trascrizione veloce (Whisper base, decoding greedy, lingua automatica)"""
+        return self.asr.transcribe(
+            file_path,
+            start or 0,
+            end,
+            model_size="base",
+            language=None,
+            quality="fast",
+        )
 
-        # Trascrivi
-        result = self.whisper_model.transcribe(y, fp16=torch.cuda.is_available())
-        return result["text"].strip()
+    def _record_load(self, variant: str, load_seconds: float):
+        """Registra il tempo di caricamento: il primo del processo è cold, gli altri warm"""
+        stats = self.load_stats.setdefault(variant, {})
+        stats["loads"] = stats.get("loads", 0) + 1
+        key = "cold_seconds" if stats["loads"] == 1 else "warm_seconds"
+        stats[key] = round(load_seconds, 2)
+
+    @staticmethod
+    def _variant(model_type: str, quantization: str = None) -> str:
+        """Chiave della variante di un modello (es. "base" o "base:int8")"""
+        return f"{model_type}:{quantization}" if quantization else model_type
+
+    def _estimate_footprint(self, variant: str, model_info) -> int:
+        """Stima i byte necessari per un modello non ancora residente"""
+        if variant in self._footprint_hints:
+            return self._footprint_hints[variant]
+        weight_files = [
+            f
+            for pattern in ("*.safetensors", "*.bin", "*.pt")
+            for f in Path(model_info).rglob(pattern)
+        ]
+        return sum(f.stat().st_size for f in weight_files)
+
+    def _from_pretrained(self, model_path: Path, dtype=None, model_type: str = None):
+        """
+        Carica un modello Qwen secondo la device policy (fallback a eager).
+        Se gli snapshot sono abilitati carica dallo snapshot nel dtype target,
+        preparandolo al primo uso.
+        """
+        if self.snapshots is not None and model_type is not None:
+            target_dtype = dtype or self.device_policy.dtype
+            try:
+                model_path, prepare_seconds = self.snapshots.ensure(
+                    model_type, model_path, target_dtype
+                )
+                if prepare_seconds:
+                    stats = self.load_stats.setdefault(model_type, {})
+                    stats["snapshot_prepare_seconds"] = round(prepare_seconds, 2)
+            except Exception as e:
+                # Snapshot non disponibile: si carica dalla cartella originale
+                print(f"Snapshot di '{model_type}' non disponibile: {e}")
 
-    def load_model(self, target_type: str) -> bool:
-        """Carica un modello specifico, scaricando il precedente se necessario"""
-        if self.current_model_type == target_type:
-            return True  # Già caricato
+        try:
+            return Qwen3TTSModel.from_pretrained(
+                str(model_path), **self.device_policy.load_kwargs(dtype=dtype)
+            )
+        except (ValueError, ImportError) as e:
+            if self.device_policy.attention == "eager":
+                raise
+            # Attention non supportata dall'architettura: fallback a eager
+            print(f"Attention '{self.device_policy.attention}' non disponibile ({e}), uso eager")
+            return Qwen3TTSModel.from_pretrained(
+                str(model_path), **self.device_policy.load_kwargs("eager", dtype)
+            )
 
-        self.unload_model()
+    def _load_quantized(self, target_type: str, model_path: Path, mode: str) -> tuple:
+        """
+        Ritorna (modello quantizzato, metadati) dalla cache su disco, oppure
+        carica il modello fp32, lo quantizza e lo salva in cache.
+        """
+        cached = self.quantized_cache.load(target_type, mode, model_path)
+        if cached is not None:
+            return cached
 
-        model_paths = {
-            "base": self.models_dir / "base",
-            "custom": self.models_dir / "custom",
-            "design": self.models_dir / "design",
-            "whisper": "large-v3",  # Large-v3 for best transcription quality
+        # La quantizzazione dinamica parte da pesi fp32
+        model = self._from_pretrained(
+            model_path, dtype=torch.float32, model_type=target_type
+        )
+        unquantized_bytes = _module_nbytes(model)
+        quantize_start = time.time()
+        quantize_dynamic_int8(model)
+        meta = {
+            "unquantized_bytes": unquantized_bytes,
+            "quantized_bytes": state_nbytes(model),
+            "quantize_seconds": round(time.time() - quantize_start, 2),
         }
+        self.quantized_cache.save(target_type, mode, model_path, model, meta)
+        return model, meta
 
-        model_info = model_paths.get(target_type)
-        if not model_info:
-            raise ValueError(f"Modello '{target_type}' non trovato")
+    def load_model(self, target_type: str, quantization: str = None) -> bool:
+        """
+        Attiva un modello specifico. Se è già residente nel pool viene solo
+        riattivato; altrimenti viene caricato evictando i modelli residenti
+        (LRU o cost-aware) finché il budget di memoria lo consente.
 
-        if target_type == "whisper":
-            self.current_model = whisper.load_model(
-                model_info, device="cuda" if torch.cuda.is_available() else "cpu"
-            )
-        else:
+        Args:
+            target_type: "base", "custom" o "design"
+            quantization: "int8" (solo CPU) oppure None per il default
+                configurato (QWENTTS_QUANTIZATION)
+        """
+        if quantization is None:
+            quantization = self.quantization
+        if quantization and quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Quantizzazione '{quantization}' non supportata")
+        if quantization and self.device_policy.is_cuda:
+            # I kernel int8 dinamici esistono solo su CPU
+            print("Quantizzazione int8 disponibile solo su CPU: ignorata")
+            quantization = None
+
+        with self._pool_lock:
+            resident = self.resident_models.get(target_type)
+            if resident is not None and resident["quantization"] != quantization:
+                # Residente con un'altra quantizzazione: va ricaricato
+                self.unload_model(target_type)
+            if target_type in self.resident_models:
+                # Già residente: nessun ricaricamento
+                info = self.resident_models[target_type]
+                self.resident_models.move_to_end(target_type)
+                info["uses"] += 1
+                info["last_used"] = time.time()
+                self.current_model = info["model"]
+                self.current_model_type = target_type
+                return True
+
+            model_paths = {
+                "base": self.models_dir / "base",
+                "custom": self.models_dir / "custom",
+                "design": self.models_dir / "design",
+            }
+
+            model_info = model_paths.get(target_type)
+            if not model_info:
+                raise ValueError(f"Modello '{target_type}' non trovato")
             if not model_info.exists():
                 raise ValueError(f"Modello '{target_type}' non trovato in {model_info}")
 
-            self.current_model = Qwen3TTSModel.from_pretrained(
-                str(model_info),
-                device_map="cuda:0",
-                dtype=torch.bfloat16,
-                attn_implementation="eager",
-            )
-        self.current_model_type = target_type
-        return True
-
-    def transcribe(self, audio_path: str, start: float = 0, end: float = None) -> str:
-        """Trascrive audio usando Whisper con massima qualità"""
-        self.load_model("whisper")
-
-        # Load audio with librosa to handle slicing
-        y, sr = librosa.load(audio_path, sr=16000)
-
-        # Slice if needed
-        if start > 0 or end is not None:
-            start_sample = int(start * sr)
-            end_sample = int(end * sr) if end else len(y)
-            y = y[start_sample:end_sample]
-
-        # Transcribe with optimal parameters for quality
-        result = self.current_model.transcribe(
-            y,
-            language="it",  # Italian language for better accuracy
-            task="transcribe",
-            fp16=torch.cuda.is_available(),
-            temperature=0,  # Deterministic output (no sampling randomness)
-            beam_size=5,  # Beam search for better quality
-            best_of=5,  # Consider multiple candidates
-            patience=1.0,  # Patience for beam search
-            condition_on_previous_text=True,  # Better context handling
-            initial_prompt="",  # Can be customized if needed
-            word_timestamps=False,  # Don't need word-level timestamps
+            # Libera spazio nel pool per il nuovo modello
+            variant = self._variant(target_type, quantization)
+            needed = self._estimate_footprint(variant, model_info)
+            while (
+                self.resident_models
+                and self._pool_used_bytes() + needed > self.pool_budget_bytes
+            ):
+                self.unload_model(self._pick_victim())
+
+            load_start = time.time()
+            if quantization:
+                model, quant_meta = self._load_quantized(
+                    target_type, model_info, quantization
+                )
+                footprint = quant_meta["quantized_bytes"] or needed
+                unquantized_footprint = quant_meta["unquantized_bytes"]
+            else:
+                model = self._from_pretrained(model_info, model_type=target_type)
+                footprint = _module_nbytes(model) or needed
+                unquantized_footprint = footprint
+            load_seconds = time.time() - load_start
+            self._record_load(variant, load_seconds)
+
+            self._footprint_hints[variant] = footprint
+            self.resident_models[target_type] = {
+                "model": model,
+                "quantization": quantization,
+                "footprint_bytes": footprint,
+                "unquantized_footprint_bytes": unquantized_footprint,
+                "load_seconds": load_seconds,
+                "uses": 1,
+                "last_used": time.time(),
+            }
+            self.current_model = model
+            self.current_model_type = target_type
+            return True
+
+    def transcribe(
+        self,
+        audio_path: str,
+        start: float = 0,
+        end: float = None,
+        model_size: str = None,
+        language: str = "it",
+    ) -> str:
+        """
+        Trascrive audio usando Whisper con massima qualità.
+        Gira sul sottosistema ASR, quindi non scarica il modello TTS attivo.
+        """
+        return self.asr.transcribe(
+            audio_path, start, end, model_size=model_size, language=language
         )
-        return result["text"].strip()
 
-    def generate(self, params: dict) -> tuple:
-        """Genera audio in base al modello corrente"""
+    @contextmanager
+    def _decode_progress(self, text_chars: int, progress_callback, streams: int = 1):
+        """
+        Attiva un DecodeMonitor per la durata della generazione: notifica il
+        progresso (se richiesto) e registra il throughput del device.
+        """
+        monitor = DecodeMonitor(self.current_model, text_chars, progress_callback)
+        monitor.streams = streams
+        self._decode_monitor = monitor
+        try:
+            yield
+            resident = self.resident_models.get(self.current_model_type, {})
+            self.device_policy.record_decode(
+                self._variant(self.current_model_type, resident.get("quantization")),
+                monitor.frames,
+                time.time() - monitor.start_time,
+            )
+        finally:
+            monitor.close()
+            self._decode_monitor = None
+
+    def generate(self, params: dict, progress_callback=None) -> tuple:
+        """
+        Genera audio in base al modello corrente.
+
+        Args:
+            params: Parametri di generazione
+            progress_callback: Funzione callback(info) chiamata durante la
+                decodifica con frames, tokens_per_sec, audio_seconds, eta, fraction
+        """
         if self.current_model is None:
             raise RuntimeError("Nessun modello caricato")
 
-        if self.current_model_type == "base":
-            return self._generate_clone(params)
-        elif self.current_model_type == "custom":
-            return self._generate_custom(params)
-        elif self.current_model_type == "design":
-            return self._generate_design(params)
+        # Seed esplicito: campionamento riproducibile (e quindi cacheabile)
+        if params.get("seed") is not None:
+            torch.manual_seed(int(params["seed"]))
+
+        with self._decode_progress(len(params.get("text", "")), progress_callback):
+            if self.current_model_type == "base":
+                return self._generate_clone(params)
+            elif self.current_model_type == "custom":
+                return self._generate_custom(params)
+            elif self.current_model_type == "design":
+                return self._generate_design(params)
+
+    def generate_batch(self, params_list: list, progress_callback=None) -> list:
+        """
+        Genera più richieste indipendenti con una sola chiamata batch al modello
+        (input a liste, padding interno). Per il modello Base le richieste
+        devono condividere il riferimento (stessa personalità oppure stesso
+        ref_audio/intervallo/ref_text). Seed e temperatura sono quelli della
+        prima richiesta: il chiamante raggruppa solo richieste che li condividono.
+
+        Args:
+            params_list: Lista di params (stesso formato di generate)
+            progress_callback: Callback di progresso condivisa dal batch
+
+        Returns:
+            Lista di tuple (wavs, sr), una per richiesta, nello stesso ordine
+        """
+        if self.current_model is None:
+            raise RuntimeError("Nessun modello caricato")
+        if len(params_list) == 1:
+            return [self.generate(params_list[0], progress_callback)]
+
+        texts = [params["text"] for params in params_list]
+        languages = [params.get("language", "Auto") for params in params_list]
+        text_chars = sum(len(text) for text in texts)
+
+        # Un solo stato del generatore per tutto il batch
+        seed = params_list[0].get("seed")
+        if seed is not None:
+            torch.manual_seed(int(seed))
+
+        with self._decode_progress(text_chars, progress_callback, len(params_list)):
+            if self.current_model_type == "base":
+                return self._generate_clone_batch(params_list)
+            elif self.current_model_type == "custom":
+                wavs, sr = self.current_model.generate_custom_voice(
+                    text=texts,
+                    language=languages,
+                    speaker=[params["speaker"] for params in params_list],
+                    instruct=[params.get("instruct", "") for params in params_list],
+                )
+            elif self.current_model_type == "design":
+                wavs, sr = self.current_model.generate_voice_design(
+                    text=texts,
+                    language=languages,
+                    instruct=[params["instruct"] for params in params_list],
+                )
+            else:
+                raise ValueError(
+                    f"Generazione batch non supportata per il modello '{self.current_model_type}'"
+                )
+
+        return [([wav], sr) for wav in wavs]
+
+    def _generate_clone_batch(self, params_list: list) -> list:
+        """
+        Clonazione batch: in modalità personalità tutti i segmenti di tutti i
+        testi passano insieme dalla cache/batch dei segmenti; in modalità
+        manuale il riferimento viene codificato una volta e riusato.
+        Riferimento (personalità o ref_audio), seed e temperatura sono quelli
+        della prima richiesta e valgono per tutto il batch; in modalità
+        personalità anche la lingua.
+        """
+        first = params_list[0]
+        personality_config = first.get("personality_config")
+
+        if personality_config:
+            # Segmenti di tutti i testi in un'unica lista, poi regroup per testo
+            owners = []
+            segments = []
+            for index, params in enumerate(params_list):
+                for segment in self._parse_tagged_text(params["text"]):
+                    owners.append(index)
+                    segments.append(segment)
+
+            results = self._synthesize_segments(
+                segments,
+                personality_config,
+                first.get("language", "Auto"),
+                batch_size=first.get("segment_batch_size"),
+                seed=first.get("seed"),
+                no_cache=first.get("no_cache", False),
+            )
+
+            grouped = [[] for _ in params_list]
+            for owner, result in zip(owners, results):
+                if result is not None:
+                    grouped[owner].append(result)
+            return [self._concatenate_segments(group) for group in grouped]
+
+        ref_audio, ref_sr = self._prepare_clone_reference(
+            first["ref_audio"], first.get("start_time"), first.get("end_time")
+        )
+        prompt = self.current_model.create_voice_clone_prompt(
+            ref_audio=(ref_audio, ref_sr), ref_text=first["ref_text"]
+        )
+        wavs, sr = self.current_model.generate_voice_clone(
+            text=[params["text"] for params in params_list],
+            language=[params.get("language", "Auto") for params in params_list],
+            voice_clone_prompt=prompt * len(params_list),
+            temperature=first.get("temperature", 0.7),
+        )
+        return [([wav], sr) for wav in wavs]
 
     def _parse_tagged_text(self, text: str):
         """
@@ -179,7 +619,103 @@ class ModelManager:
 
         return segments
 
-    def _generate_multi_segment(self, segments, personality_config, language="Auto"):
+    def _split_sentences(self, text: str, max_chars: int = None) -> list:
+        """
+        Divide un testo in frasi per la sintesi incrementale.
+        Frammenti molto corti vengono uniti alla frase successiva, frasi
+        più lunghe di max_chars vengono spezzate sulle virgole.
+        """
+        if max_chars is None:
+            max_chars = STREAM_CHUNK_MAX_CHARS
+
+        sentences = [
+            part.strip()
+            for part in re.split(r"(?<=[.!?…;])\s+|\n+", text)
+            if part.strip()
+        ]
+
+        chunks = []
+        pending = ""
+        for sentence in sentences:
+            sentence = f"{pending} {sentence}".strip() if pending else sentence
+            pending = ""
+            if len(sentence) < 20:
+                # Frammento troppo corto per una chiamata a sé
+                pending = sentence
+                continue
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(", ", 0, max_chars)
+                if cut <= 0:
+                    cut = sentence.rfind(" ", 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                chunks.append(sentence[: cut + 1].strip())
+                sentence = sentence[cut + 1 :].strip()
+            if sentence:
+                chunks.append(sentence)
+
+        if pending:
+            if chunks:
+                chunks[-1] = f"{chunks[-1]} {pending}"
+            else:
+                chunks.append(pending)
+        return chunks
+
+    def split_stream_chunks(self, params: dict) -> list:
+        """
+        Divide il testo di una richiesta nei chunk da sintetizzare in ordine.
+        In modalità personalità ogni chunk mantiene il proprio tag emotivo
+        (es. "[arrabbiato] Chi ha toccato i file?").
+        """
+        text = params["text"]
+        if not params.get("personality_config"):
+            return self._split_sentences(text)
+
+        chunks = []
+        for tag, segment_text in self._parse_tagged_text(text):
+            for sentence in self._split_sentences(segment_text):
+                chunks.append(f"[{tag}] {sentence}" if tag else sentence)
+        return chunks
+
+    def generate_iter(self, params: dict):
+        """
+        Genera audio in modo incrementale, un chunk (frase o segmento) alla volta.
+
+        Yields:
+            Tuple (wav, sr) per ogni chunk, nell'ordine del testo
+        """
+        for chunk_text in self.split_stream_chunks(params):
+            wavs, sr = self.generate({**params, "text": chunk_text})
+            yield wavs[0], sr
+
+    def _get_voice_clone_prompt(
+        self, personality: str, tag: str, ref_audio_path: str, ref_text: str
+    ):
+        """
+        Ritorna il prompt di clonazione (audio di riferimento già codificato)
+        per una emozione di una personalità, codificandolo solo al primo uso.
+
+        La chiave include l'hash del contenuto del file, quindi se il sample
+        viene sostituito su disco il prompt viene ricalcolato.
+        """
+        key = (personality, tag, file_content_hash(ref_audio_path), ref_text)
+        prompt = self.ref_prompt_cache.get(key)
+        if prompt is None:
+            prompt = self.current_model.create_voice_clone_prompt(
+                ref_audio=ref_audio_path, ref_text=ref_text
+            )
+            self.ref_prompt_cache.put(key, prompt)
+        return prompt
+
+    def _generate_multi_segment(
+        self,
+        segments,
+        personality_config,
+        language="Auto",
+        batch_size=None,
+        seed=None,
+        no_cache=False,
+    ):
         """
         Genera audio per ogni segmento usando il sample audio corrispondente
         e concatena i risultati.
@@ -188,16 +724,61 @@ class ModelManager:
             segments: Lista di tuple (tag, text) dal parser
             personality_config: Dict config.json della personalità
             language: Lingua per la generazione
+            batch_size: Segmenti per chiamata al modello (1 = sequenziale)
+            seed: Seed della richiesta (entra nella chiave della cache)
+            no_cache: Non usare la cache dei segmenti
 
         Returns:
             Tuple (wavs, sr) con audio concatenato
         """
-        audio_chunks = []
-        sample_rate = None
+        results = self._synthesize_segments(
+            segments, personality_config, language, batch_size, seed, no_cache
+        )
+        return self._concatenate_segments([r for r in results if r is not None])
+
+    def _synthesize_segments(
+        self,
+        segments,
+        personality_config,
+        language="Auto",
+        batch_size=None,
+        seed=None,
+        no_cache=False,
+    ) -> list:
+        """
+        Sintetizza una lista di segmenti taggati.
+
+        I segmenti già sintetizzati (stessa personalità, tag, testo normalizzato
+        e parametri) vengono presi dalla cache dei segmenti; solo quelli
+        mancanti vengono raggruppati in batch (anche con emozioni di
+        riferimento diverse) ed eseguiti con un'unica chiamata padded al
+        modello. L'output viene poi riportato nell'ordine originale.
+
+        Come per la cache di output, la cache dei segmenti è usata solo con
+        seed esplicito e senza no_cache: senza seed ogni richiesta è una
+        nuova take e i segmenti vengono sempre risintetizzati (e non salvati).
+
+        Returns:
+            Lista di (wav, sr) allineata a segments (None per i segmenti vuoti)
+        """
+        if batch_size is None:
+            batch_size = SEGMENT_BATCH_SIZE
+        batch_size = max(1, int(batch_size))
+
         emotions_data = personality_config.get("emotions", {})
+        personality_name = personality_config.get(
+            "name", personality_config["_base_dir"]
+        )
+        use_cache = seed is not None and not no_cache
 
+        # Risolvi il tag di ogni segmento e cerca l'audio nella cache dei segmenti
+        results = []  # (wav, sr) per segmento, nell'ordine del testo
+        misses = []  # (indice, testo, tag, ref_audio_path, ref_text, chiave cache)
         for tag, text in segments:
-            if not text.strip():
+            # Testo normalizzato: spazi diversi non generano nuove sintesi
+            text = " ".join(text.split())
+            if not text:
+                results.append(None)
                 continue
 
             # Se il tag è None o non esiste, usa il primo disponibile come fallback
@@ -216,29 +797,77 @@ class ModelManager:
             )
             ref_text = emotion_data["ref_text"]
 
-            # Genera segmento audio
-            wavs, sr = self.current_model.generate_voice_clone(
-                text=text,
-                language=language,
-                ref_audio=ref_audio_path,
-                ref_text=ref_text,
+            cache_key = (
+                personality_name,
+                tag,
+                file_content_hash(ref_audio_path),
+                ref_text,
+                text,
+                language,
+                seed,
+            )
+            cached = self.segment_cache.get(cache_key) if use_cache else None
+            results.append(cached)
+            if cached is None:
+                misses.append(
+                    (len(results) - 1, text, tag, ref_audio_path, ref_text, cache_key)
+                )
+
+        # Il progresso reale riguarda solo i segmenti da sintetizzare
+        if self._decode_monitor is not None and misses:
+            self._decode_monitor.expected_frames = max(
+                1.0,
+                sum(len(miss[1]) for miss in misses)
+                / CHARS_PER_AUDIO_SECOND
+                * CODEC_FRAME_RATE,
             )
 
-            # Memorizza il primo sample rate
-            if sample_rate is None:
-                sample_rate = sr
-            elif sample_rate != sr:
-                # Resample se necessario (non dovrebbe accadere)
-                import librosa
+        for batch_start in range(0, len(misses), batch_size):
+            batch = misses[batch_start : batch_start + batch_size]
 
-                wavs[0] = librosa.resample(wavs[0], orig_sr=sr, target_sr=sample_rate)
+            # Un prompt per ogni testo del batch (codificato una sola volta per
+            # emozione): il modello esegue il padding
+            prompts = []
+            for _, _, tag, ref_audio_path, ref_text, _ in batch:
+                prompts.extend(
+                    self._get_voice_clone_prompt(
+                        personality_name, tag, ref_audio_path, ref_text
+                    )
+                )
 
-            audio_chunks.append(wavs[0])
+            if self._decode_monitor is not None:
+                self._decode_monitor.streams = len(batch)
 
-        # Concatena tutti i chunk
-        if len(audio_chunks) == 0:
+            wavs, sr = self.current_model.generate_voice_clone(
+                text=[miss[1] for miss in batch],
+                language=[language] * len(batch),
+                voice_clone_prompt=prompts,
+            )
+
+            # L'output del batch segue l'ordine dei testi in input
+            for miss, wav in zip(batch, wavs):
+                index, cache_key = miss[0], miss[5]
+                results[index] = (wav, sr)
+                if use_cache:
+                    self.segment_cache.put(cache_key, (wav, sr))
+
+        return results
+
+    def _concatenate_segments(self, results: list) -> tuple:
+        """Concatena gli audio (wav, sr) dei segmenti al sample rate del primo"""
+        if len(results) == 0:
             raise ValueError("Nessun audio generato")
 
+        # Memorizza il primo sample rate
+        sample_rate = results[0][1]
+        audio_chunks = []
+        for wav, sr in results:
+            if sr != sample_rate:
+                # Resample se necessario (non dovrebbe accadere)
+                wav = librosa.resample(wav, orig_sr=sr, target_sr=sample_rate)
+            audio_chunks.append(wav)
+
+        # Concatena tutti i chunk
         concatenated = np.concatenate(audio_chunks, axis=0)
 
         return [concatenated], sample_rate
@@ -257,74 +886,74 @@ class ModelManager:
             language = params.get("language", "Auto")
 
             segments = self._parse_tagged_text(text)
-            return self._generate_multi_segment(segments, personality_config, language)
+            return self._generate_multi_segment(
+                segments,
+                personality_config,
+                language,
+                batch_size=params.get("segment_batch_size"),
+                seed=params.get("seed"),
+                no_cache=params.get("no_cache", False),
+            )
 
-        # Modalità Manuale: comportamento originale
-        ref_audio_path = params["ref_audio"]
+        # Modalità Manuale: riferimento preparato in memoria (niente file temporaneo)
+        ref_audio = self._prepare_clone_reference(
+            params["ref_audio"], params.get("start_time"), params.get("end_time")
+        )
 
-        # Pre-process audio: slice and normalize
-        # Se params ha start/end, usali. Altrimenti, se il file è lungo, taglia i primi 15s.
-        start = params.get("start_time")
-        end = params.get("end_time")
+        # Extract temperature parameter (default: 0.7)
+        temperature = params.get("temperature", 0.7)
 
-        # Carica audio originale
-        y, sr = sf.read(ref_audio_path)
+        return self.current_model.generate_voice_clone(
+            text=params["text"],
+            language=params.get("language", "Auto"),
+            ref_audio=ref_audio,
+            ref_text=params["ref_text"],
+            temperature=temperature,
+        )
 
-        # Se stereo, converti in mono (media dei canali)
-        if len(y.shape) > 1:
-            y = np.mean(y, axis=1)
+    def _prepare_clone_reference(self, ref_audio_path, start=None, end=None) -> tuple:
+        """
+        Taglia e normalizza l'audio di riferimento per la clonazione manuale.
+        Il risultato è memoizzato per (hash file, start, end), quindi le
+        richieste successive sullo stesso riferimento non rileggono il file.
 
-        original_duration = len(y) / sr
+        Returns:
+            Tuple (array float32 mono, sample_rate) da passare come ref_audio
+        """
+        cache_key = (file_content_hash(ref_audio_path), start, end)
+        cached = self.clone_reference_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Pre-process audio: slice and normalize
+        # Se params ha start/end, usali. Altrimenti sceglie con il VAD la finestra
+        # di parlato più densa (senza silenzi ai bordi); se il VAD non trova
+        # parlato, se il file è lungo taglia i primi 15s.
+        # Viene decodificato (con seek) solo l'intervallo scelto, non l'intero file.
+        window = None
+        if start is None:
+            window = self.speech_windows.select(ref_audio_path, REF_WINDOW_SECONDS)
 
-        # Determina i punti di taglio
         if start is not None:
-            start_sample = int(float(start) * sr)
-            end_sample = int(float(end) * sr) if end is not None else len(y)
-            # Clip ai limiti
-            start_sample = max(0, start_sample)
-            end_sample = min(len(y), end_sample)
-            y_segment = y[start_sample:end_sample]
-        elif original_duration > 15:
+            y_segment, sr = read_audio_range(
+                ref_audio_path, float(start), float(end) if end is not None else None
+            )
+        elif window is not None:
+            y_segment, sr = read_audio_range(ref_audio_path, *window)
+        elif audio_duration(ref_audio_path) > 15:
             # Fallback intelligente: prendi 15s ignorando il primo secondo (spesso silenzio o rumore)
-            start_sample = int(1.0 * sr)
-            end_sample = int(16.0 * sr)
-            if start_sample >= len(y):  # File molto corto o strano
-                start_sample = 0
-                end_sample = min(len(y), int(15.0 * sr))
-            y_segment = y[start_sample:end_sample]
+            y_segment, sr = read_audio_range(ref_audio_path, 1.0, 16.0)
         else:
-            y_segment = y
+            y_segment, sr = read_audio_range(ref_audio_path)
 
         # Normalizzazione (Peak Normalization a -1.0 dB)
         max_val = np.max(np.abs(y_segment))
         if max_val > 0:
             y_segment = y_segment / max_val * 0.9
 
-        # Salva segmento temporaneo
-        import tempfile
-
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            sf.write(tmp.name, y_segment, sr)
-            temp_slice_path = Path(tmp.name)
-
-        try:
-            # Extract temperature parameter (default: 0.7)
-            temperature = params.get("temperature", 0.7)
-
-            return self.current_model.generate_voice_clone(
-                text=params["text"],
-                language=params.get("language", "Auto"),
-                ref_audio=str(temp_slice_path),
-                ref_text=params["ref_text"],
-                temperature=temperature,
-            )
-        finally:
-            # Pulizia file temporaneo
-            if temp_slice_path and temp_slice_path.exists():
-                try:
-                    temp_slice_path.unlink()
-                except:
-                    pass
+        reference = (y_segment.astype(np.float32), sr)
+        self.clone_reference_cache.put(cache_key, reference)
+        return reference
 
     def _generate_custom(self, params):
         return self.current_model.generate_custom_voice(
@@ -360,38 +989,131 @@ class ModelManager:
         Raises:
             RuntimeError: Se il modello VoiceDesign non è caricato
         """
+        return self.generate_emotional_guides(text, voice_description, [emotion], language)
+
+    def generate_emotional_guides(
+        self,
+        text: str,
+        voice_description: str,
+        emotions: list,
+        language: str = "Auto",
+        progress_callback=None,
+    ) -> tuple:
+        """
+        Genera le guide emotive di più emozioni sullo stesso testo con
+        chiamate batch a VoiceDesign (fino a SEGMENT_BATCH_SIZE per chiamata).
+
+        Args:
+            text: Testo da sintetizzare (uguale per tutte le emozioni)
+            voice_description: Descrizione base della voce
+            emotions: Lista di emozioni target
+            language: Lingua del testo
+            progress_callback: Callback di progresso della decodifica
+
+        Returns:
+            Tuple (wavs, sample_rate) con un audio per emozione, nello stesso ordine
+
+        Raises:
+            RuntimeError: Se il modello VoiceDesign non è caricato
+        """
+        wavs = []
+        sample_rate = None
+        for _, batch_wavs, sample_rate in self.iter_emotional_guides(
+            text, voice_description, emotions, language, progress_callback
+        ):
+            wavs.extend(batch_wavs)
+        return wavs, sample_rate
+
+    def iter_emotional_guides(
+        self,
+        text: str,
+        voice_description: str,
+        emotions: list,
+        language: str = "Auto",
+        progress_callback=None,
+    ):
+        """
+        Come generate_emotional_guides, ma restituisce ogni batch appena
+        generato: il chiamante può elaborarlo mentre il modello genera il
+        batch successivo.
+
+        Yields:
+            Tuple (emozioni del batch, wavs, sample_rate)
+        """
         if self.current_model_type != "design":
             raise RuntimeError(
                 "Modello VoiceDesign non caricato. Chiamare load_model('design') prima."
             )
 
-        # Costruisci il prompt per l'emozione
-        emotion_prompts = {
-            "rabbia": "parlando con estrema rabbia e frustrazione, voce alta e concitata",
-            "felicità": "parlando con grande gioia ed entusiasmo, tono allegro e vivace",
-            "paura": "parlando con paura e timore, voce tremante e incerta",
-            "tristezza": "parlando con profonda tristezza e malinconia, voce bassa e lenta",
-            "sorpresa": "parlando con grande sorpresa e stupore, tono esclamativo",
-            "neutro": "parlando con tono neutro e naturale",
-        }
-
-        emotion_suffix = emotion_prompts.get(
+        for start in range(0, len(emotions), SEGMENT_BATCH_SIZE):
+            batch = emotions[start : start + SEGMENT_BATCH_SIZE]
+            with self._decode_progress(
+                len(text) * len(batch), progress_callback, len(batch)
+            ):
+                wavs, sample_rate = self.current_model.generate_voice_design(
+                    text=[text] * len(batch),
+                    language=[language] * len(batch),
+                    instruct=[
+                        self._emotion_instruct(voice_description, emotion)
+                        for emotion in batch
+                    ],
+                )
+            yield batch, wavs, sample_rate
+
+    def _emotion_instruct(self, voice_description: str, emotion: str) -> str:
+        """Combina descrizione voce + prompt dell'emozione"""
+        emotion_suffix = EMOTION_PROMPTS.get(
             emotion.lower(), f"parlando con emozione: {emotion}"
         )
-
-        # Combina descrizione voce + emozione
-        full_instruct = f"{voice_description}, {emotion_suffix}"
-
-        return self.current_model.generate_voice_design(
-            text=text, language=language, instruct=full_instruct
-        )
+        return f"{voice_description}, {emotion_suffix}"
 
     def get_status(self) -> dict:
         """Ritorna lo stato corrente"""
-        vram_used = (
-            torch.cuda.memory_allocated() / 1024**3 if torch.cuda.is_available() else 0
-        )
+        vram_used = self.device_policy.memory_allocated() / 1024**3
+        device_status = self.device_policy.get_status(CODEC_FRAME_RATE)
+        throughput = device_status["throughput"]
+        with self._pool_lock:
+            resident = []
+            for model_type, info in reversed(self.resident_models.items()):
+                entry = {
+                    "model_type": model_type,
+                    "quantization": info["quantization"],
+                    "footprint_gb": round(info["footprint_bytes"] / 1024**3, 2),
+                    "load_seconds": round(info["load_seconds"], 2),
+                    "uses": info["uses"],
+                    "active": model_type == self.current_model_type,
+                }
+                if info["quantization"]:
+                    # Confronto con la variante non quantizzata dello stesso modello
+                    entry["unquantized_footprint_gb"] = round(
+                        info["unquantized_footprint_bytes"] / 1024**3, 2
+                    )
+                    quantized = throughput.get(
+                        self._variant(model_type, info["quantization"])
+                    )
+                    unquantized = throughput.get(model_type)
+                    if quantized and unquantized and unquantized["real_time_factor"]:
+                        entry["real_time_factor_ratio"] = round(
+                            quantized["real_time_factor"]
+                            / unquantized["real_time_factor"],
+                            3,
+                        )
+                resident.append(entry)
+            pool_used = self._pool_used_bytes()
         return {
             "model_loaded": self.current_model_type,
             "vram_used_gb": round(vram_used, 2),
+            "resident_models": resident,
+            "pool_used_gb": round(pool_used / 1024**3, 2),
+            "pool_budget_gb": round(self.pool_budget_bytes / 1024**3, 2),
+            "eviction_policy": MODEL_EVICTION_POLICY,
+            "device": device_status,
+            "quantization": self.quantization,
+            "load_times": self.load_stats,
+            "snapshots": self.snapshots.stats() if self.snapshots is not None else None,
+            "asr": self.asr.get_status(),
+            "ref_prompt_cache": self.ref_prompt_cache.stats(),
+            "segment_cache": self.segment_cache.stats(),
+            "clone_reference_cache": self.clone_reference_cache.stats(),
+            "speech_window_cache": self.speech_windows.stats(),
         }
@@ -0,0 +1,163 @@
+"""
+Model Snapshot Module - Snapshot dei modelli pronti per il caricamento veloce
+
+Uno snapshot è una copia della cartella del modello in
+`models/.snapshots/<tipo>-<dtype>/` con i pesi safetensors principali già
+convertiti nel dtype di destinazione. `from_pretrained` li apre in mmap
+e non deve più convertire i tensori a ogni caricamento: dopo il primo
+accesso le pagine restano nella page cache del sistema operativo e un
+ricaricamento costa pochi secondi.
+
+I file che non richiedono conversione (config, tokenizer, sottocartelle
+come lo speech tokenizer, pesi già nel dtype giusto) vengono collegati
+con hardlink quando possibile, quindi lo snapshot non raddoppia lo
+spazio su disco. Lo snapshot viene ricostruito se cambiano i file sorgente.
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Tuple
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+# Snapshot dei modelli abilitati ("0" = carica sempre dalla cartella originale)
+MODEL_SNAPSHOTS = os.environ.get("QWENTTS_MODEL_SNAPSHOTS", "1") != "0"
+
+# Nomi dei dtype floating nell'header safetensors
+_SAFETENSORS_DTYPES = {
+    torch.float64: "F64",
+    torch.float32: "F32",
+    torch.float16: "F16",
+    torch.bfloat16: "BF16",
+}
+
+
+def _dtype_name(dtype: torch.dtype) -> str:
+    return str(dtype).replace("torch.", "")
+
+
+def _link_or_copy(src: Path, dst: Path):
+    """Hardlink del file (stesso filesystem), altrimenti copia"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class SnapshotStore:
+    """Prepara e risolve gli snapshot dei modelli per dtype"""
+
+    def __init__(self, root_dir: Path):
+        """
+        Args:
+            root_dir: Directory degli snapshot (es. models/.snapshots)
+        """
+        self.root_dir = root_dir
+
+    def _signature(self, source_dir: Path) -> list:
+        """Firma dei file sorgente (path relativo, dimensione, mtime)"""
+        return [
+            [str(f.relative_to(source_dir)), f.stat().st_size, f.stat().st_mtime_ns]
+            for f in sorted(source_dir.rglob("*"))
+            if f.is_file()
+        ]
+
+    def _is_valid(self, snapshot_dir: Path, source_dir: Path) -> bool:
+        meta_path = snapshot_dir / "snapshot.json"
+        if not meta_path.exists():
+            return False
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception:
+            return False
+        return meta.get("signature") == self._signature(source_dir)
+
+    def ensure(
+        self, model_type: str, source_dir: Path, dtype: torch.dtype
+    ) -> Tuple[Path, float]:
+        """
+        Ritorna lo snapshot del modello per il dtype richiesto, preparandolo
+        se manca o è obsoleto.
+
+        Returns:
+            Tuple (path dello snapshot, secondi spesi a prepararlo; 0 se già pronto)
+        """
+        snapshot_dir = self.root_dir / f"{model_type}-{_dtype_name(dtype)}"
+        if self._is_valid(snapshot_dir, source_dir):
+            return snapshot_dir, 0.0
+
+        prepare_start = time.time()
+        tmp_dir = snapshot_dir.with_name(snapshot_dir.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        for src in sorted(source_dir.rglob("*")):
+            dst = tmp_dir / src.relative_to(source_dir)
+            if src.is_dir():
+                dst.mkdir(parents=True, exist_ok=True)
+            elif src.suffix == ".safetensors" and src.parent == source_dir:
+                # Solo i pesi del modello principale: le sottocartelle (speech
+                # tokenizer) mantengono la loro precisione
+                self._convert_weights(src, dst, dtype)
+            else:
+                _link_or_copy(src, dst)
+
+        with open(tmp_dir / "snapshot.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "source": str(source_dir),
+                    "dtype": _dtype_name(dtype),
+                    "created_at": time.time(),
+                    "signature": self._signature(source_dir),
+                },
+                f,
+                indent=2,
+            )
+
+        # Sostituzione atomica: uno snapshot a metà non viene mai usato
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        os.replace(tmp_dir, snapshot_dir)
+        return snapshot_dir, time.time() - prepare_start
+
+    def _convert_weights(self, src: Path, dst: Path, dtype: torch.dtype):
+        """Converte i tensori floating di un file safetensors nel dtype target"""
+        with safe_open(str(src), framework="pt") as f:
+            metadata = f.metadata() or {}
+            keys = list(f.keys())
+            float_dtypes = set(_SAFETENSORS_DTYPES.values())
+            stored = {f.get_slice(k).get_dtype() for k in keys}
+            # Nessuna conversione necessaria: basta collegare il file
+            if not (stored & float_dtypes) - {_SAFETENSORS_DTYPES[dtype]}:
+                _link_or_copy(src, dst)
+                return
+            tensors = {}
+            for key in keys:
+                tensor = f.get_tensor(key)
+                if tensor.is_floating_point():
+                    tensor = tensor.to(dtype)
+                tensors[key] = tensor.contiguous()
+        save_file(tensors, str(dst), metadata={**metadata, "format": "pt"})
+
+    def stats(self) -> dict:
+        """Snapshot presenti e spazio aggiuntivo occupato (esclusi i file in hardlink)"""
+        if not self.root_dir.exists():
+            return {"snapshots": [], "extra_size_gb": 0.0}
+        snapshots = sorted(
+            d.name for d in self.root_dir.iterdir() if (d / "snapshot.json").exists()
+        )
+        inodes = {}
+        for f in self.root_dir.rglob("*"):
+            if f.is_file():
+                st = f.stat()
+                if st.st_nlink == 1:
+                    inodes[(st.st_dev, st.st_ino)] = st.st_size
+        return {
+            "snapshots": snapshots,
+            "extra_size_gb": round(sum(inodes.values()) / 1024**3, 2),
+        }
@@ -0,0 +1,221 @@
+"""
+Output Cache Module - Cache su disco dell'audio renderizzato
+
+Ogni richiesta di sintesi viene ridotta a un fingerprint deterministico
+(testo, modello, voce, personalità, riferimento audio, temperatura, seed,
+formato). L'audio generato viene salvato come `<fingerprint>.<formato>`
+nella directory di output, quindi una richiesta identica restituisce
+subito l'URL del file esistente. Lo spazio è limitato da un budget in
+byte con eviction LRU (l'mtime del file registra l'ultimo accesso).
+
+Solo le richieste riproducibili passano dalla cache: con seed esplicito,
+oppure con temperatura 0 nella clonazione manuale (l'unico percorso che
+passa la temperatura al modello; gli altri campionano con i default del
+modello). Senza seed ogni generazione è una nuova "take" e non deve
+restituire il file precedente; `no_cache` esclude comunque la richiesta.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from cache_utils import file_content_hash
+
+# Budget su disco della cache di output (MB, 0 = cache disabilitata)
+OUTPUT_CACHE_MB = int(os.environ.get("QWENTTS_OUTPUT_CACHE_MB", "2048"))
+
+# I file in cache hanno come nome lo SHA-256 del fingerprint
+_CACHE_FILE_RE = re.compile(r"^[0-9a-f]{64}\.(wav|mp3)$")
+
+
+class OutputCache:
+    """Cache content-addressed dei file audio generati"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int = OUTPUT_CACHE_MB * 1024**2):
+        """
+        Args:
+            cache_dir: Directory dei file audio (la stessa servita da /api/audio)
+            max_bytes: Budget su disco (0 disabilita la cache)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # filename -> (size, last_access)
+        self._index: Dict[str, tuple] = {}
+
+        # Ricostruisce l'indice dai file già presenti
+        for item in self.cache_dir.iterdir():
+            if item.is_file() and _CACHE_FILE_RE.match(item.name):
+                st = item.stat()
+                self._index[item.name] = (st.st_size, st.st_mtime)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def cacheable(self, params: dict) -> bool:
+        """
+        True se l'audio della richiesta è riproducibile e può essere cercato
+        e salvato in cache: seed esplicito, oppure temperatura 0 nella
+        clonazione manuale (senza no_cache).
+        """
+        if not self.enabled or params.get("no_cache"):
+            return False
+        if params.get("seed") is not None:
+            return True
+        # La temperatura arriva al modello solo nella clonazione manuale
+        manual_clone = params.get("expected_model") == "base" and not (
+            params.get("personality_name") or params.get("personality_config")
+        )
+        return manual_clone and params.get("temperature") == 0
+
+    def fingerprint(self, params: dict, audio_format: str) -> str:
+        """
+        Calcola il fingerprint deterministico di una richiesta di sintesi.
+        I file di riferimento entrano nel fingerprint tramite l'hash del
+        contenuto, quindi sostituirli invalida la cache.
+        """
+        key = {
+            "text": params.get("text", ""),
+            "model": params.get("expected_model"),
+            "language": params.get("language", "Auto"),
+            "speaker": params.get("speaker"),
+            "instruct": params.get("instruct"),
+            "temperature": params.get("temperature"),
+            "seed": params.get("seed"),
+            "format": audio_format,
+        }
+
+        if params.get("ref_audio"):
+            key["ref_audio"] = file_content_hash(params["ref_audio"])
+            key["ref_text"] = params.get("ref_text")
+            key["start_time"] = params.get("start_time")
+            key["end_time"] = params.get("end_time")
+
+        personality_config = params.get("personality_config")
+        if personality_config:
+            base_dir = Path(personality_config["_base_dir"])
+            key["personality"] = {
+                tag: [emotion["ref_text"], file_content_hash(base_dir / emotion["file"])]
+                for tag, emotion in personality_config.get("emotions", {}).items()
+            }
+
+        canonical = json.dumps(key, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def lookup(self, fingerprint: str, audio_format: str) -> Optional[str]:
+        """Ritorna il nome del file in cache per il fingerprint, o None"""
+        if not self.enabled:
+            return None
+
+        filename = f"{fingerprint}.{audio_format}"
+        path = self.cache_dir / filename
+        with self._lock:
+            if filename not in self._index or not path.exists():
+                self._index.pop(filename, None)
+                self.misses += 1
+                return None
+            now = time.time()
+            self._index[filename] = (self._index[filename][0], now)
+            self.hits += 1
+        # Aggiorna l'mtime: l'ordine LRU sopravvive ai riavvii
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return filename
+
+    def publish(
+        self, wav_path: Path, audio_format: str, fingerprint: Optional[str]
+    ) -> str:
+        """
+        Converte in MP3 (se richiesto) un WAV appena scritto e, se c'è un
+        fingerprint, lo registra nella cache. Usato sia dalle generazioni in
+        un colpo che dal long-form, così le due pipeline non divergono.
+
+        Args:
+            wav_path: WAV renderizzato nella directory di output
+            audio_format: "wav" oppure "mp3"
+            fingerprint: Fingerprint della richiesta (None = non riproducibile)
+
+        Returns:
+            Nome del file da servire tramite /api/audio
+        """
+        rendered_path = wav_path
+        if audio_format == "mp3":
+            try:
+                from pydub import AudioSegment
+
+                mp3_path = wav_path.with_suffix(".mp3")
+                audio = AudioSegment.from_wav(str(wav_path))
+                audio.export(str(mp3_path), format="mp3", bitrate="192k")
+                wav_path.unlink()
+                rendered_path = mp3_path
+            except ImportError:
+                # pydub mancante: si serve il WAV come in passato
+                pass
+
+        # Richiesta non riproducibile, oppure formato diverso da quello richiesto
+        # (la lookup cerca <fingerprint>.<formato>): file fuori dalla cache
+        if fingerprint is None or rendered_path.suffix != f".{audio_format}":
+            return rendered_path.name
+        # Il file prende il nome del fingerprint ed entra nella cache
+        return self.store(fingerprint, rendered_path)
+
+    def store(self, fingerprint: str, rendered_path: Path) -> str:
+        """
+        Sposta un file appena generato nella sua posizione in cache.
+
+        Returns:
+            Nome del file da servire tramite /api/audio
+        """
+        if not self.enabled:
+            return rendered_path.name
+
+        filename = f"{fingerprint}{rendered_path.suffix}"
+        target = self.cache_dir / filename
+        os.replace(rendered_path, target)
+
+        with self._lock:
+            self._index[filename] = (target.stat().st_size, time.time())
+            self._evict(keep=filename)
+        return filename
+
+    def _evict(self, keep: str):
+        """Elimina i file meno usati finché la cache rientra nel budget"""
+        total = sum(size for size, _ in self._index.values())
+        for filename, (size, _) in sorted(
+            self._index.items(), key=lambda item: item[1][1]
+        ):
+            if total <= self.max_bytes:
+                break
+            if filename == keep:
+                continue
+            try:
+                (self.cache_dir / filename).unlink()
+            except OSError:
+                pass
+            del self._index[filename]
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Ritorna statistiche d'uso della cache"""
+        with self._lock:
+            size = sum(size for size, _ in self._index.values())
+            return {
+                "files": len(self._index),
+                "size_mb": round(size / 1024**2, 2),
+                "budget_mb": round(self.max_bytes / 1024**2, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
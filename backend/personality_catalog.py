@@ -0,0 +1,239 @@
+"""
+Personality Catalog Module - Indice in memoria delle personalità salvate
+
+`list_all` apriva e parsava il config.json di ogni personalità a ogni
+richiesta e `get_details` rileggeva il JSON a ogni generazione. Il catalogo
+tiene in memoria config e riepilogo di ogni personalità:
+- lookup: un solo stat del config.json, riletto solo se mtime/size cambiano
+- lista: lettura in memoria; la cartella viene riscansionata (solo stat, i
+  JSON invariati non vengono riletti) quando cambia il suo mtime o dopo
+  QWENTTS_PERSONALITY_RESCAN_SECONDS, per intercettare modifiche esterne
+- create/delete aggiornano l'indice direttamente
+
+Con QWENTTS_PERSONALITY_INDEX l'indice è salvato anche in un file SQLite:
+all'avvio i riepiloghi vengono letti con una sola query e si rileggono da
+disco solo i config.json modificati nel frattempo.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# File SQLite dell'indice delle personalità ("" = solo in memoria)
+PERSONALITY_INDEX_PATH = os.environ.get("QWENTTS_PERSONALITY_INDEX", "")
+# Intervallo massimo tra due verifiche complete della cartella (secondi)
+RESCAN_SECONDS = float(os.environ.get("QWENTTS_PERSONALITY_RESCAN_SECONDS", "30"))
+
+
+def _summary(name: str, config: dict) -> dict:
+    """Riepilogo mostrato nella lista delle personalità"""
+    return {
+        "name": config.get("name", name),
+        "original_name": config.get("original_name", name),
+        "created_at": config.get("created_at", ""),
+        "emotion_count": len(config.get("emotions", {})),
+    }
+
+
+class PersonalityCatalog:
+    """Indice in memoria (opzionalmente persistito su SQLite) dei config.json"""
+
+    def __init__(self, base_dir: Path, index_path: str = PERSONALITY_INDEX_PATH):
+        """
+        Args:
+            base_dir: Directory delle personalità
+            index_path: File SQLite dell'indice ("" = solo in memoria)
+        """
+        self.base_dir = base_dir
+        self.index_path = Path(index_path) if index_path else None
+        # nome cartella -> {mtime_ns, size, summary, config, raw}
+        self._entries: Dict[str, dict] = {}
+        self._sorted: Optional[List[dict]] = None
+        self._lock = threading.Lock()
+        self._dir_mtime_ns = None
+        self._last_scan = 0.0
+
+        if self.index_path is not None:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS personalities ("
+                    "name TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, "
+                    "size INTEGER NOT NULL, summary TEXT NOT NULL, config TEXT NOT NULL)"
+                )
+                rows = conn.execute(
+                    "SELECT name, mtime_ns, size, summary, config FROM personalities"
+                ).fetchall()
+            for name, mtime_ns, size, summary, raw in rows:
+                # Config parsato solo al primo lookup
+                self._entries[name] = {
+                    "mtime_ns": mtime_ns,
+                    "size": size,
+                    "summary": json.loads(summary),
+                    "config": None,
+                    "raw": raw,
+                }
+
+        self.refresh()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Una connessione per operazione: sicuro tra thread diversi
+        return sqlite3.connect(str(self.index_path), timeout=10)
+
+    def _config_path(self, name: str) -> Path:
+        return self.base_dir / name / "config.json"
+
+    def _load(self, name: str, st: os.stat_result) -> Optional[dict]:
+        """Rilegge un config.json da disco (None se illeggibile)"""
+        try:
+            with open(self._config_path(name), "r", encoding="utf-8") as f:
+                raw = f.read()
+            config = json.loads(raw)
+        except Exception as e:
+            print(f"Errore lettura config per {name}: {e}")
+            return None
+        return {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "summary": _summary(name, config),
+            "config": config,
+            "raw": raw,
+        }
+
+    def _apply(self, updates: Dict[str, dict], removed: List[str]):
+        """Aggiorna indice in memoria e file SQLite (una sola transazione)"""
+        if not updates and not removed:
+            return
+        with self._lock:
+            self._entries.update(updates)
+            for name in removed:
+                self._entries.pop(name, None)
+            self._sorted = None
+        if self.index_path is not None:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO personalities "
+                    "(name, mtime_ns, size, summary, config) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            name,
+                            entry["mtime_ns"],
+                            entry["size"],
+                            json.dumps(entry["summary"]),
+                            entry["raw"],
+                        )
+                        for name, entry in updates.items()
+                    ],
+                )
+                conn.executemany(
+                    "DELETE FROM personalities WHERE name = ?",
+                    [(name,) for name in removed],
+                )
+
+    def _reload(self, name: str, st: os.stat_result) -> Optional[dict]:
+        """Rilegge una singola personalità e aggiorna l'indice"""
+        entry = self._load(name, st)
+        if entry is None:
+            self.remove(name)
+        else:
+            self._apply({name: entry}, [])
+        return entry
+
+    def _is_current(self, entry: Optional[dict], st: os.stat_result) -> bool:
+        return (
+            entry is not None
+            and entry["mtime_ns"] == st.st_mtime_ns
+            and entry["size"] == st.st_size
+        )
+
+    def refresh(self):
+        """Allinea l'indice alla cartella: stat di ogni config, rilettura dei soli modificati"""
+        # mtime letto prima della scansione: un cambiamento durante la scansione
+        # provoca comunque una nuova verifica alla prossima lista
+        self._dir_mtime_ns = self.base_dir.stat().st_mtime_ns
+        self._last_scan = time.time()
+
+        found = {}
+        with os.scandir(self.base_dir) as it:
+            for item in it:
+                if not item.is_dir():
+                    continue
+                try:
+                    found[item.name] = os.stat(self._config_path(item.name))
+                except FileNotFoundError:
+                    continue
+
+        with self._lock:
+            known = dict(self._entries)
+        removed = [name for name in known if name not in found]
+        updates = {}
+        for name, st in found.items():
+            if self._is_current(known.get(name), st):
+                continue
+            entry = self._load(name, st)
+            if entry is None:
+                removed.append(name)
+            else:
+                updates[name] = entry
+        self._apply(updates, [name for name in removed if name in known])
+
+    def _refresh_if_stale(self):
+        try:
+            dir_mtime_ns = self.base_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if (
+            dir_mtime_ns != self._dir_mtime_ns
+            or time.time() - self._last_scan > RESCAN_SECONDS
+        ):
+            self.refresh()
+
+    def get(self, name: str) -> Optional[dict]:
+        """
+        Config della personalità (nome di cartella già sanitizzato), oppure
+        None se non esiste. Il dict restituito è condiviso: non modificarlo.
+        """
+        try:
+            st = os.stat(self._config_path(name))
+        except (FileNotFoundError, NotADirectoryError):
+            self.remove(name)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(name)
+        if not self._is_current(entry, st):
+            entry = self._reload(name, st)
+            if entry is None:
+                return None
+
+        if entry["config"] is None:
+            # Voce caricata dall'indice SQLite: parsing al primo accesso
+            entry["config"] = json.loads(entry["raw"])
+        return entry["config"]
+
+    def summaries(self) -> List[dict]:
+        """Riepiloghi di tutte le personalità, ordinati per nome"""
+        self._refresh_if_stale()
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(
+                    (entry["summary"] for entry in self._entries.values()),
+                    key=lambda x: x["name"],
+                )
+            return [dict(summary) for summary in self._sorted]
+
+    def put(self, name: str):
+        """Registra (o aggiorna) una personalità appena scritta su disco"""
+        self._reload(name, os.stat(self._config_path(name)))
+
+    def remove(self, name: str):
+        """Rimuove una personalità dall'indice"""
+        with self._lock:
+            if name not in self._entries:
+                return
+        self._apply({}, [name])
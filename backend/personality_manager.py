@@ -1,22 +1,35 @@
+import copy
 import json
+import os
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from chimera_maker import load_pcm16
+from personality_catalog import PERSONALITY_INDEX_PATH, PersonalityCatalog
+
+# Thread per l'assemblaggio e la scrittura delle chimere di una Smart Personality
+CHIMERA_WORKERS = int(os.environ.get("QWENTTS_CHIMERA_WORKERS", "2"))
+
 
 class PersonalityManager:
     """Gestisce il CRUD delle personalità vocali su file system"""
 
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, index_path: str = PERSONALITY_INDEX_PATH):
         """
         Inizializza il manager delle personalità
 
         Args:
             base_dir: Directory root per salvare le personalità (es. saved_personalities/)
+            index_path: File SQLite dell'indice delle personalità ("" = solo in memoria)
         """
         self.base_dir = base_dir
         self.base_dir.mkdir(exist_ok=True)
+        # Indice in memoria dei config.json, caricato all'avvio
+        self.catalog = PersonalityCatalog(base_dir, index_path)
 
     def _sanitize_name(self, name: str) -> str:
         """Sanitizza il nome della personalità per uso come nome cartella"""
@@ -94,6 +107,7 @@ class PersonalityManager:
             config_path = personality_dir / "config.json"
             with open(config_path, "w", encoding="utf-8") as f:
                 json.dump(config, f, indent=2, ensure_ascii=False)
+            self.catalog.put(sanitized_name)
 
             return config
 
@@ -110,30 +124,7 @@ class PersonalityManager:
         Returns:
             Lista di dict con {name, original_name, created_at}
         """
-        personalities = []
-
-        for item in self.base_dir.iterdir():
-            if item.is_dir():
-                config_path = item / "config.json"
-                if config_path.exists():
-                    try:
-                        with open(config_path, "r", encoding="utf-8") as f:
-                            config = json.load(f)
-                            personalities.append(
-                                {
-                                    "name": config.get("name", item.name),
-                                    "original_name": config.get(
-                                        "original_name", item.name
-                                    ),
-                                    "created_at": config.get("created_at", ""),
-                                    "emotion_count": len(config.get("emotions", {})),
-                                }
-                            )
-                    except Exception as e:
-                        print(f"Errore lettura config per {item.name}: {e}")
-                        continue
-
-        return sorted(personalities, key=lambda x: x["name"])
+        return self.catalog.summaries()
 
     def get_details(self, name: str) -> Optional[Dict[str, any]]:
         """
@@ -146,18 +137,12 @@ class PersonalityManager:
             Dict con config completo o None se non trovata
         """
         sanitized_name = self._sanitize_name(name)
-        personality_dir = self.base_dir / sanitized_name
-        config_path = personality_dir / "config.json"
-
-        if not config_path.exists():
+        if not sanitized_name:
             return None
 
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Errore lettura config per {sanitized_name}: {e}")
-            return None
+        config = self.catalog.get(sanitized_name)
+        # Copia: i chiamanti possono arricchire la config (es. _base_dir)
+        return copy.deepcopy(config) if config is not None else None
 
     def get_audio_path(self, name: str, tag: str) -> Optional[Path]:
         """
@@ -202,6 +187,7 @@ class PersonalityManager:
 
         try:
             shutil.rmtree(personality_dir)
+            self.catalog.remove(sanitized_name)
             return True
         except Exception as e:
             print(f"Errore eliminazione personalità {sanitized_name}: {e}")
@@ -224,8 +210,8 @@ class PersonalityManager:
         Crea una Smart Personality usando la Chimera Reference Pipeline.
 
         Processo:
-        1. Genera guide emotive con VoiceDesign per ogni emozione
-        2. Crea chimere fondendo audio utente + guide emotive
+        1. Genera le guide emotive con VoiceDesign (una chiamata batch per tutte)
+        2. Crea chimere fondendo in memoria audio utente + guide emotive
         3. Salva tutto come nuova personalità
 
         Args:
@@ -247,9 +233,6 @@ class PersonalityManager:
             ValueError: Se la personalità esiste già o parametri invalidi
             RuntimeError: Se ci sono errori durante la generazione
         """
-        import tempfile
-        import soundfile as sf
-
         sanitized_name = self._sanitize_name(name)
         if not sanitized_name:
             raise ValueError("Nome personalità invalido")
@@ -266,14 +249,18 @@ class PersonalityManager:
             if progress_callback:
                 progress_callback(stage, progress)
 
+        # Pool per lettura/copia del sorgente e assemblaggio/scrittura delle
+        # chimere: lavora mentre il modello genera il batch successivo
+        pool = ThreadPoolExecutor(
+            max_workers=CHIMERA_WORKERS, thread_name_prefix="chimera"
+        )
+
         try:
-            # Copia l'audio sorgente nella personalità
+            # Copia e lettura dell'audio sorgente in parallelo alla generazione
             source_filename = "source_neutro.wav"
             source_dest = personality_dir / source_filename
-            import shutil
-
-            shutil.copy2(source_audio_path, source_dest)
-            report_progress("Audio sorgente copiato", 5)
+            copy_future = pool.submit(shutil.copy2, source_audio_path, source_dest)
+            source_future = pool.submit(load_pcm16, source_audio_path)
 
             # Costruisci config base
             config = {
@@ -294,73 +281,76 @@ class PersonalityManager:
             }
             report_progress("Emozione neutro aggiunta", 10)
 
-            # Genera le guide emotive e crea le chimere
-            progress_per_emotion = 50 // len(emotions) if emotions else 0
-            current_progress = 20
-
-            for idx, emotion in enumerate(emotions):
-                report_progress(f"Generando guida emotiva: {emotion}", current_progress)
-
-                # Genera l'audio emotivo con VoiceDesign
-                wavs_ai, sr_ai = model_manager.generate_emotional_guide(
-                    text=source_transcript,
-                    voice_description=voice_description,
-                    emotion=emotion,
-                    language="Auto",
+            # Avanzamento: 20-60 generazione delle guide, 60-90 chimere
+            progress_lock = threading.Lock()
+            completed = [0]
+
+            def build_chimera(emotion: str, wav_ai, sr_ai: int) -> str:
+                """Crea e scrive la chimera di un'emozione (eseguita dal pool)"""
+                source_audio, source_sr = source_future.result()
+                chimera_filename = f"hybrid_{emotion}.wav"
+                chimera_maker.create_from_numpy(
+                    source_array=source_audio,
+                    ai_array=wav_ai,
+                    sample_rate=source_sr,
+                    output_path=personality_dir / chimera_filename,
+                    segment_duration_ms=segment_duration_ms,
+                    crossfade_ms=crossfade_ms,
+                    ai_sample_rate=sr_ai,
                 )
-
-                # Salva temporaneamente l'audio AI
-                with tempfile.NamedTemporaryFile(
-                    suffix=f"_{emotion}_ai.wav", delete=False
-                ) as tmp:
-                    ai_temp_path = Path(tmp.name)
-                    sf.write(str(ai_temp_path), wavs_ai[0], sr_ai)
-
-                current_progress += progress_per_emotion // 2
-                report_progress(f"Creando chimera: {emotion}", current_progress)
-
-                try:
-                    # Crea la chimera
-                    chimera_filename = f"hybrid_{emotion}.wav"
-                    chimera_path = personality_dir / chimera_filename
-
-                    chimera_maker.create_hybrid_reference(
-                        source_audio_path=source_audio_path,
-                        ai_audio_path=ai_temp_path,
-                        output_path=chimera_path,
-                        segment_duration_ms=segment_duration_ms,
-                        crossfade_ms=crossfade_ms,
+                with progress_lock:
+                    completed[0] += 1
+                    report_progress(
+                        f"Chimera {emotion} completata",
+                        60 + 30 * completed[0] // len(emotions),
                     )
+                return chimera_filename
+
+            # Genera le guide emotive in batch con VoiceDesign; le chimere di
+            # ogni batch vengono create dal pool durante il batch seguente
+            chimera_futures = {}
+            generated = 0
+            report_progress(f"Generando guide emotive: {', '.join(emotions)}", 20)
+            for batch, wavs_ai, sr_ai in model_manager.iter_emotional_guides(
+                text=source_transcript,
+                voice_description=voice_description,
+                emotions=emotions,
+                language="Auto",
+            ):
+                for emotion, wav_ai in zip(batch, wavs_ai):
+                    chimera_futures[emotion] = pool.submit(
+                        build_chimera, emotion, wav_ai, sr_ai
+                    )
+                generated += len(batch)
+                report_progress(
+                    f"Guide emotive generate: {generated}/{len(emotions)}",
+                    20 + 40 * generated // len(emotions),
+                )
 
-                    # Aggiungi al config
-                    config["emotions"][emotion] = {
-                        "file": chimera_filename,
-                        "ref_text": source_transcript,
-                    }
-
-                    current_progress += progress_per_emotion // 2
-                    report_progress(f"Chimera {emotion} completata", current_progress)
-
-                finally:
-                    # Pulizia file temporaneo AI
-                    try:
-                        ai_temp_path.unlink()
-                    except Exception:
-                        pass
+            copy_future.result()
+            for emotion in emotions:
+                # Aggiungi al config (rilancia l'eventuale errore della chimera)
+                config["emotions"][emotion] = {
+                    "file": chimera_futures[emotion].result(),
+                    "ref_text": source_transcript,
+                }
 
             # Salva config.json
             report_progress("Salvando configurazione", 90)
             config_path = personality_dir / "config.json"
             with open(config_path, "w", encoding="utf-8") as f:
                 json.dump(config, f, indent=2, ensure_ascii=False)
+            self.catalog.put(sanitized_name)
 
             report_progress("Completato!", 100)
             return config
 
         except Exception as e:
+            # Nessuna scrittura del pool in corso durante il rollback
+            pool.shutdown(wait=True, cancel_futures=True)
             # Rollback: elimina la directory se qualcosa va storto
             if personality_dir.exists():
-                import shutil
-
                 shutil.rmtree(personality_dir)
             raise RuntimeError(f"Errore creazione smart personality: {str(e)}") from e
+        finally:
+            pool.shutdown()
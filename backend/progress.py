@@ -0,0 +1,142 @@
+"""
+Progress Module - Canale eventi di progresso per gli stream SSE
+
+Il thread di generazione pubblica gli eventi (stage, progresso, ETA) nel
+momento in cui avvengono; il generatore SSE resta bloccato sulla coda
+finché non arriva un evento, inviando un heartbeat se il silenzio supera
+il timeout. Nessun polling e nessuna sleep fissa.
+"""
+
+import json
+import queue
+import threading
+from typing import Dict, Iterator, Optional
+
+# Secondi di silenzio dopo i quali lo stream invia un heartbeat
+HEARTBEAT_SECONDS = 2.0
+
+
+class ProgressChannel:
+    """Canale publish/subscribe per gli aggiornamenti di un singolo job"""
+
+    def __init__(self, **initial_state):
+        """
+        Args:
+            initial_state: Campi iniziali dello stato (es. progress=0, stage="...")
+        """
+        self.state: Dict = dict(initial_state)
+        self.closed = False
+        self._error_event: Optional[Dict] = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def _publish(self, event: Dict, final: bool = False):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = final
+            for subscriber in self._subscribers:
+                subscriber.put(event)
+
+    def update(self, **fields):
+        """Aggiorna lo stato e notifica subito tutti gli iscritti"""
+        with self._lock:
+            self.state.update(fields)
+            event = dict(self.state)
+        self._publish(event)
+
+    def finish(self, **fields):
+        """Pubblica l'evento finale di completamento e chiude il canale"""
+        with self._lock:
+            self.state.update(fields)
+            self.state["done"] = True
+            event = dict(self.state)
+        self._publish(event, final=True)
+
+    def fail(self, error: str, **fields):
+        """
+        Pubblica un errore e chiude il canale. I campi extra (es. job_id per
+        la ripresa) vengono inviati insieme all'errore.
+        """
+        with self._lock:
+            self.state["error"] = error
+            self._error_event = {**fields, "error": error}
+            event = dict(self._error_event)
+        self._publish(event, final=True)
+
+    def subscribe(self) -> "queue.Queue":
+        """Ritorna una coda che riceve lo stato corrente e gli eventi successivi"""
+        subscriber = queue.Queue()
+        with self._lock:
+            if self._error_event is not None:
+                subscriber.put(dict(self._error_event))
+            else:
+                subscriber.put(dict(self.state))
+            if not self.closed:
+                self._subscribers.append(subscriber)
+        return subscriber
+
+    def events(self, heartbeat: Optional[float] = HEARTBEAT_SECONDS) -> Iterator[Dict]:
+        """
+        Itera sugli eventi del canale bloccando sulla coda.
+        Se per `heartbeat` secondi non arriva nulla, ripete l'ultimo stato.
+        Termina dopo l'evento finale (done o error).
+        """
+        subscriber = self.subscribe()
+        while True:
+            try:
+                event = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                with self._lock:
+                    event = dict(self.state)
+            yield event
+            if event.get("done") or event.get("error"):
+                return
+
+    def sse(self, *fields: str, heartbeat: Optional[float] = HEARTBEAT_SECONDS):
+        """
+        Generatore di messaggi SSE (`data: {...}`).
+        Gli eventi intermedi includono solo `fields`; quelli finali sono completi.
+        """
+        for event in self.events(heartbeat):
+            if not (event.get("done") or event.get("error")) and fields:
+                event = {k: event[k] for k in fields if k in event}
+            yield f"data: {json.dumps(event)}\n\n"
+
+
+class ChannelRegistry:
+    """
+    Registro dei job in corso indicizzati per chiave (single-flight).
+    Una richiesta con la stessa chiave di un job già in esecuzione si
+    aggancia al suo canale invece di avviare un nuovo job.
+    """
+
+    def __init__(self):
+        self._channels: Dict[str, ProgressChannel] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def open(self, key: str, **initial_state):
+        """
+        Ritorna (channel, created): created è True se il chiamante deve
+        avviare il job, False se si è agganciato a un job già in corso.
+        """
+        with self._lock:
+            channel = self._channels.get(key)
+            # Un job già concluso con successo è ancora valido (evento finale in replay)
+            if channel is not None and not channel.state.get("error"):
+                self.coalesced += 1
+                return channel, False
+            channel = ProgressChannel(**initial_state)
+            self._channels[key] = channel
+            return channel, True
+
+    def close(self, key: str, channel: ProgressChannel):
+        """Rimuove il job dal registro (solo se è ancora quello registrato)"""
+        with self._lock:
+            if self._channels.get(key) is channel:
+                del self._channels[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"in_flight": len(self._channels), "coalesced": self.coalesced}
@@ -0,0 +1,239 @@
+"""
+Scheduler Module - Coda centrale dei job sul modello
+
+Tutte le operazioni che usano i modelli TTS passano da un unico worker:
+- i job vengono serializzati (niente race sul ModelManager singleton)
+- tra i job in coda viene preferito quello del modello già attivo, per
+  ridurre gli swap; un job che aspetta troppo ha comunque la precedenza
+- job compatibili (stessa batch_key) vengono eseguiti insieme in batch
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, List, Optional
+
+# Attesa massima (secondi) oltre la quale un job scavalca l'affinità di modello
+MAX_AFFINITY_WAIT_SECONDS = float(
+    os.environ.get("QWENTTS_SCHEDULER_MAX_AFFINITY_WAIT", "10")
+)
+# Numero massimo di job compatibili eseguiti in un solo batch
+MAX_BATCH_SIZE = int(os.environ.get("QWENTTS_SCHEDULER_MAX_BATCH", "8"))
+
+
+class Job:
+    """Un'unità di lavoro da eseguire sul worker del modello"""
+
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        model_type: Optional[str],
+        fn: Optional[Callable] = None,
+        batch_fn: Optional[Callable] = None,
+        batch_key: Optional[Hashable] = None,
+        payload: Any = None,
+        on_start: Optional[Callable] = None,
+    ):
+        """
+        Args:
+            model_type: Modello da attivare prima dell'esecuzione (None = nessuno)
+            fn: Funzione fn(manager) eseguita per il job singolo
+            batch_fn: Funzione batch_fn(manager, payloads) -> lista di risultati
+            batch_key: Job con la stessa chiave (hashable) possono essere eseguiti in batch
+            payload: Dati del job passati a batch_fn
+            on_start: Callback on_start(job) chiamata quando il job esce dalla coda
+        """
+        self.id = next(self._ids)
+        self.model_type = model_type
+        self.fn = fn
+        self.batch_fn = batch_fn
+        self.batch_key = batch_key if batch_fn is not None else None
+        self.payload = payload
+        self.on_start = on_start
+        self.future = Future()
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def result(self, timeout: Optional[float] = None):
+        """Attende e ritorna il risultato (rilancia l'eccezione del job)"""
+        return self.future.result(timeout)
+
+    @property
+    def wait_seconds(self) -> float:
+        end = self.started_at if self.started_at is not None else time.time()
+        return end - self.submitted_at
+
+
+class JobScheduler:
+    """Worker singolo con coda, affinità di modello e batching"""
+
+    def __init__(self, manager, max_batch_size: int = MAX_BATCH_SIZE):
+        """
+        Args:
+            manager: Istanza ModelManager su cui eseguire i job
+            max_batch_size: Numero massimo di job per batch
+        """
+        self.manager = manager
+        self.max_batch_size = max_batch_size
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self.running: List[Job] = []
+
+        # Statistiche
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.model_switches = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+        self._worker = threading.Thread(
+            target=self._run, name="model-worker", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, model_type: Optional[str], fn: Callable = None, **kwargs) -> Job:
+        """
+        Accoda un job e ritorna subito l'oggetto Job.
+
+        Args:
+            model_type: Modello richiesto dal job (None = indipendente dal modello)
+            fn: Funzione fn(manager) da eseguire
+            kwargs: batch_fn, batch_key, payload, on_start (vedi Job)
+        """
+        job = Job(model_type, fn, **kwargs)
+        with self._cond:
+            self._queue.append(job)
+            self._cond.notify()
+        return job
+
+    def position(self, job: Job) -> int:
+        """Posizione del job in coda (0 = in esecuzione o completato)"""
+        with self._cond:
+            for index, queued in enumerate(self._queue):
+                if queued is job:
+                    return index + 1
+        return 0
+
+    def _pick_next(self) -> Job:
+        """Sceglie il prossimo job: anti-starvation, poi affinità di modello, poi FIFO"""
+        oldest = self._queue[0]
+        if oldest.wait_seconds >= MAX_AFFINITY_WAIT_SECONDS:
+            return oldest
+
+        active = self.manager.current_model_type
+        for job in self._queue:
+            if job.model_type is None or job.model_type == active:
+                return job
+        return oldest
+
+    def _take_batch(self) -> List[Job]:
+        """Estrae dalla coda il prossimo job e quelli compatibili con esso"""
+        first = self._pick_next()
+        self._queue.remove(first)
+        batch = [first]
+
+        if first.batch_key is not None:
+            for job in list(self._queue):
+                if len(batch) >= self.max_batch_size:
+                    break
+                if job.batch_key == first.batch_key and job.model_type == first.model_type:
+                    self._queue.remove(job)
+                    batch.append(job)
+        return batch
+
+    def _fail(self, jobs: List[Job], error: Exception):
+        """Propaga l'errore ai job non ancora completati"""
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_exception(error)
+                self.failed += 1
+
+    def _execute(self, batch: List[Job]):
+        """Esegue il batch; se fallisce, riesegue i job uno alla volta"""
+        try:
+            if len(batch) == 1 and batch[0].fn is not None:
+                results = [batch[0].fn(self.manager)]
+            else:
+                results = batch[0].batch_fn(self.manager, [job.payload for job in batch])
+                self.batches += 1
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch, e)
+                return
+            # Un solo payload non valido non deve far fallire gli altri job:
+            # l'eccezione arriva solo al job che la provoca
+            for job in batch:
+                self._execute([job])
+            return
+
+        for job, result in zip(batch, results):
+            job.future.set_result(result)
+        self.completed += len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                batch = self._take_batch()
+                self.running = batch
+
+            now = time.time()
+            for job in batch:
+                job.started_at = now
+                self._total_wait += job.wait_seconds
+                self._max_wait = max(self._max_wait, job.wait_seconds)
+                if job.on_start is not None:
+                    try:
+                        job.on_start(job)
+                    except Exception:
+                        pass
+
+            try:
+                model_type = batch[0].model_type
+                if model_type is not None and model_type != self.manager.current_model_type:
+                    self.model_switches += 1
+                    self.manager.load_model(model_type)
+                self._execute(batch)
+            except Exception as e:
+                # Caricamento del modello fallito: nessun job può essere eseguito
+                self._fail(batch, e)
+            finally:
+                finished = time.time()
+                for job in batch:
+                    job.finished_at = finished
+                with self._cond:
+                    self.running = []
+
+    def get_status(self) -> dict:
+        """Ritorna profondità della coda e tempi di attesa"""
+        with self._cond:
+            queued = list(self._queue)
+            running = list(self.running)
+
+        by_model = {}
+        for job in queued:
+            key = job.model_type or "none"
+            by_model[key] = by_model.get(key, 0) + 1
+
+        started = self.completed + self.failed + len(running)
+        return {
+            "queue_depth": len(queued),
+            "queued_by_model": by_model,
+            "running": len(running),
+            "oldest_wait_seconds": round(
+                max((job.wait_seconds for job in queued), default=0.0), 2
+            ),
+            "avg_wait_seconds": round(self._total_wait / started, 2) if started else 0.0,
+            "max_wait_seconds": round(self._max_wait, 2),
+            "completed": self.completed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "model_switches": self.model_switches,
+        }
@@ -0,0 +1,210 @@
+"""
+Speech Window Module - Selezione automatica della finestra di parlato
+
+Il riferimento di clonazione senza intervallo esplicito veniva scelto alla
+cieca (secondi 1-16 del file) e il segmento utente delle chimere era il
+centro dell'audio: entrambi potevano includere silenzi e rumore che
+allungano il prompt senza aggiungere voce. Qui un VAD a energia (RMS su
+frame da 30 ms, soglia adattiva rispetto al rumore di fondo) individua i
+frame di parlato e sceglie la finestra della durata richiesta che ne
+contiene di più, con i bordi spostati nelle pause e il silenzio iniziale
+e finale rimosso. La finestra scelta per un file è memoizzata per
+(hash del contenuto, durata richiesta).
+"""
+
+import os
+from typing import Optional, Tuple
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from cache_utils import LRUCache, file_content_hash
+
+# Durata massima (secondi) del riferimento di clonazione scelto automaticamente
+REF_WINDOW_SECONDS = float(os.environ.get("QWENTTS_REF_WINDOW_SECONDS", "15"))
+# dB sopra il rumore di fondo oltre i quali un frame è considerato parlato
+VAD_THRESHOLD_DB = float(os.environ.get("QWENTTS_VAD_THRESHOLD_DB", "12"))
+
+# Durata di un frame di analisi (secondi)
+FRAME_SECONDS = 0.03
+# Frame più bassi di questi dB rispetto al picco sono sempre silenzio
+_DYNAMIC_RANGE_DB = 50.0
+# Livello assoluto minimo del parlato (dBFS)
+_MIN_SPEECH_DB = -50.0
+# Le pause più brevi di così (tra parole) contano come parlato nella scelta
+_HANGOVER_SECONDS = 0.3
+# Margine lasciato prima e dopo il parlato (secondi)
+_PAD_SECONDS = 0.1
+# Spostamento massimo dei bordi della finestra per cadere in una pausa (secondi)
+_SNAP_SECONDS = 0.5
+# Finestre memoizzate dall'analizzatore
+_CACHE_ITEMS = 512
+
+
+def frame_energy_db(
+    samples: np.ndarray, sample_rate: int, frame_seconds: float = FRAME_SECONDS
+) -> np.ndarray:
+    """
+    Energia RMS in dBFS di ogni frame (l'ultimo frame può essere parziale).
+
+    Args:
+        samples: Audio float [-1, 1] o int16, mono oppure (frame, canali)
+        sample_rate: Sample rate dell'audio
+        frame_seconds: Durata di un frame
+
+    Returns:
+        Array float64 con un valore per frame
+    """
+    samples = np.asarray(samples)
+    scale = 32768.0 if samples.dtype == np.int16 else 1.0
+    mono = samples.astype(np.float64) / scale
+    if mono.ndim > 1:
+        mono = mono.mean(axis=1)
+
+    frame_len = max(1, int(round(sample_rate * frame_seconds)))
+    n_frames = -(-len(mono) // frame_len)
+    if n_frames == 0:
+        return np.zeros(0)
+    padded = np.zeros(n_frames * frame_len)
+    padded[: len(mono)] = mono ** 2
+    # Media sui soli campioni reali (l'ultimo frame può essere più corto)
+    counts = np.full(n_frames, frame_len, dtype=np.float64)
+    counts[-1] = len(mono) - (n_frames - 1) * frame_len
+    power = padded.reshape(n_frames, frame_len).sum(axis=1) / counts
+    return 10 * np.log10(np.maximum(power, 1e-12))
+
+
+def file_energy_db(path, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """
+    Energia per frame di un file audio, letto a blocchi (memoria costante
+    anche per registrazioni lunghe).
+    """
+    try:
+        with sf.SoundFile(str(path)) as f:
+            frame_len = max(1, int(round(f.samplerate * frame_seconds)))
+            # Blocchi multipli del frame: nessun frame a cavallo di due blocchi
+            blocks = [
+                frame_energy_db(block, f.samplerate, frame_seconds)
+                for block in f.blocks(
+                    blocksize=frame_len * 2000, dtype="float32", always_2d=True
+                )
+            ]
+        return np.concatenate(blocks) if blocks else np.zeros(0)
+    except RuntimeError:
+        # Formato non gestito da libsndfile: decodifica completa tramite librosa
+        y, sr = librosa.load(str(path), sr=None, mono=True)
+        return frame_energy_db(y, sr, frame_seconds)
+
+
+def speech_mask(
+    energy_db: np.ndarray, threshold_db: float = VAD_THRESHOLD_DB
+) -> np.ndarray:
+    """Frame di parlato: energia sopra la soglia adattiva al rumore di fondo"""
+    if energy_db.size == 0:
+        return np.zeros(0, dtype=bool)
+    noise_floor = float(np.percentile(energy_db, 10))
+    peak = float(energy_db.max())
+    if peak - noise_floor < threshold_db:
+        # Nessun contrasto (parlato continuo o solo rumore): conta il livello assoluto
+        return energy_db > _MIN_SPEECH_DB
+    threshold = max(noise_floor + threshold_db, peak - _DYNAMIC_RANGE_DB, _MIN_SPEECH_DB)
+    return energy_db > threshold
+
+
+def select_speech_window(
+    energy_db: np.ndarray,
+    target_seconds: float,
+    frame_seconds: float = FRAME_SECONDS,
+    threshold_db: float = VAD_THRESHOLD_DB,
+) -> Optional[Tuple[float, float]]:
+    """
+    Sceglie la finestra di al massimo target_seconds con più parlato.
+
+    Args:
+        energy_db: Energia per frame (vedi frame_energy_db)
+        target_seconds: Durata massima della finestra
+        frame_seconds: Durata di un frame
+        threshold_db: Soglia del VAD sopra il rumore di fondo
+
+    Returns:
+        Tuple (inizio, fine) in secondi, oppure None se non c'è parlato
+    """
+    speech = speech_mask(energy_db, threshold_db)
+    if not speech.any():
+        return None
+    n_frames = len(speech)
+
+    # Le brevi pause tra parole contano come parlato nel conteggio
+    hangover = int(round(_HANGOVER_SECONDS / frame_seconds))
+    dense = np.convolve(speech, np.ones(2 * hangover + 1), mode="same") > 0
+
+    window = max(1, int(target_seconds / frame_seconds))
+    if n_frames <= window:
+        start, end = 0, n_frames
+    else:
+        cumulative = np.concatenate(([0], np.cumsum(dense)))
+        start = int(np.argmax(cumulative[window:] - cumulative[:-window]))
+        end = start + window
+
+        # Bordi nelle pause vicine, per non tagliare una parola a metà
+        snap = int(round(_SNAP_SECONDS / frame_seconds))
+        if speech[start]:
+            pauses = np.flatnonzero(~speech[start : min(start + snap, end)])
+            if pauses.size:
+                start += int(pauses[0])
+        if speech[end - 1]:
+            pauses = np.flatnonzero(~speech[max(end - snap, start) : end])
+            if pauses.size:
+                end = max(end - snap, start) + int(pauses[-1]) + 1
+
+    # Rimuove il silenzio iniziale e finale della finestra
+    voiced = np.flatnonzero(speech[start:end])
+    if voiced.size == 0:
+        return None
+    first = start + int(voiced[0])
+    last = start + int(voiced[-1])
+    return (
+        max(0.0, first * frame_seconds - _PAD_SECONDS),
+        min(n_frames * frame_seconds, (last + 1) * frame_seconds + _PAD_SECONDS),
+    )
+
+
+class SpeechWindowAnalyzer:
+    """Sceglie la finestra di parlato di un file, memoizzata per contenuto"""
+
+    def __init__(self, max_items: int = _CACHE_ITEMS):
+        """
+        Args:
+            max_items: Numero massimo di finestre memoizzate
+        """
+        # Valori minuscoli: il limite effettivo è il numero di elementi
+        self.cache = LRUCache(
+            max_bytes=max_items * 64, max_items=max_items, sizeof=lambda _: 64
+        )
+
+    def select(
+        self, path, target_seconds: float = REF_WINDOW_SECONDS
+    ) -> Optional[Tuple[float, float]]:
+        """
+        Ritorna (inizio, fine) in secondi della finestra di parlato più densa
+        del file, oppure None se il file non contiene parlato rilevabile.
+        """
+        cache_key = (file_content_hash(path), float(target_seconds))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached[0]
+
+        try:
+            window = select_speech_window(file_energy_db(path), target_seconds)
+        except Exception as e:
+            # Analisi non riuscita: il chiamante usa la selezione di ripiego
+            print(f"Analisi VAD di {path} fallita: {e}")
+            return None
+
+        self.cache.put(cache_key, (window,))
+        return window
+
+    def stats(self) -> dict:
+        """Statistiche della cache delle finestre"""
+        return self.cache.stats()
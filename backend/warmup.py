@@ -0,0 +1,130 @@
+"""
+Warmup Module - Preload e warmup dei modelli all'avvio del server
+
+Il primo job dopo l'avvio pagava caricamento del modello, inizializzazione
+dei kernel (CUDA/CPU) e delle pool dell'allocatore, e il caricamento di
+Whisper. Con QWENTTS_PRELOAD il server carica all'avvio i modelli elencati
+ed esegue per ciascuno una breve sintesi di warmup, passando dallo
+scheduler come qualsiasi altro job. Finché il warmup non è concluso il
+server si dichiara non pronto (/api/status risponde 503), così il load
+balancer non gli instrada traffico. Un warmup fallito non blocca il
+server: è pronto ma "degraded", con l'errore del modello in results (il
+modello verrà caricato al primo job che lo richiede).
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# Modelli da precaricare all'avvio, separati da virgola: base, custom, design, asr
+PRELOAD_MODELS = [
+    item.strip().lower()
+    for item in os.environ.get("QWENTTS_PRELOAD", "").split(",")
+    if item.strip()
+]
+# Testo breve sintetizzato per il warmup di ogni modello
+WARMUP_TEXT = os.environ.get("QWENTTS_WARMUP_TEXT", "Ciao, questo è un test.")
+# Speaker CustomVoice usato per il warmup
+WARMUP_SPEAKER = os.environ.get("QWENTTS_WARMUP_SPEAKER", "Ryan")
+
+# Sample rate del riferimento sintetico per il warmup del modello Base
+_WARMUP_REF_SR = 24000
+
+
+class WarmupManager:
+    """Esegue preload e warmup dei modelli e ne espone lo stato di readiness"""
+
+    def __init__(self, manager, scheduler, models: List[str] = None):
+        """
+        Args:
+            manager: ModelManager (per il caricamento di Whisper)
+            scheduler: JobScheduler su cui eseguire caricamenti e warmup TTS
+            models: Modelli da precaricare (default: QWENTTS_PRELOAD)
+        """
+        self.manager = manager
+        self.scheduler = scheduler
+        self.models = PRELOAD_MODELS if models is None else models
+        # "pending" -> "running" -> "ready" | "failed"
+        self.state = "pending" if self.models else "ready"
+        self.results: Dict[str, dict] = {}
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def ready(self) -> bool:
+        """True a warmup concluso, anche se qualche modello è fallito"""
+        return self.state in ("ready", "failed")
+
+    @property
+    def degraded(self) -> bool:
+        """True se il warmup di almeno un modello è fallito"""
+        return self.state == "failed"
+
+    def start(self):
+        """Avvia preload e warmup in background (no-op senza modelli configurati)"""
+        if self.state != "pending":
+            return
+        self.state = "running"
+        self.started_at = time.time()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        failed = False
+        for model_type in self.models:
+            start = time.time()
+            try:
+                if model_type == "asr":
+                    # Whisper gira fuori dal pool TTS: niente scheduler
+                    self.manager.asr.load()
+                else:
+                    job = self.scheduler.submit(
+                        model_type, lambda m, t=model_type: self._warmup(m, t)
+                    )
+                    job.result()
+                self.results[model_type] = {"seconds": round(time.time() - start, 2)}
+            except Exception as e:
+                failed = True
+                self.results[model_type] = {"error": str(e)}
+                print(f"Warmup di '{model_type}' fallito: {e}")
+
+        self.finished_at = time.time()
+        self.state = "failed" if failed else "ready"
+
+    def _warmup(self, model_manager, model_type: str):
+        """Sintesi breve sul modello appena caricato dal worker"""
+        model = model_manager.current_model
+        if model_type == "base":
+            # Riferimento sintetico in memoria: basta a percorrere encoder e decoder
+            rng = np.random.default_rng(0)
+            ref_audio = (rng.standard_normal(_WARMUP_REF_SR) * 0.01).astype(np.float32)
+            model.generate_voice_clone(
+                text=WARMUP_TEXT,
+                language="Auto",
+                ref_audio=(ref_audio, _WARMUP_REF_SR),
+                ref_text=WARMUP_TEXT,
+            )
+        elif model_type == "custom":
+            model.generate_custom_voice(
+                text=WARMUP_TEXT, language="Auto", speaker=WARMUP_SPEAKER, instruct=""
+            )
+        elif model_type == "design":
+            model.generate_voice_design(
+                text=WARMUP_TEXT, language="Auto", instruct="Voce calma e chiara."
+            )
+        else:
+            raise ValueError(f"Modello '{model_type}' non supportato per il warmup")
+
+    def get_status(self) -> dict:
+        """Stato del warmup per /api/status"""
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.time()) - self.started_at, 2)
+        return {
+            "state": self.state,
+            "models": self.models,
+            "results": self.results,
+            "elapsed_seconds": elapsed,
+        }
@@ -451,13 +451,17 @@ async function generate(params) {
         // Legge lo stream
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        let buffer = '';
 
         while (true) {
             const { value, done } = await reader.read();
             if (done) break;
 
-            const chunk = decoder.decode(value);
-            const lines = chunk.split('\n\n');
+            // Gli eventi arrivano appena pubblicati: possono essere più di uno
+            // per chunk o spezzati tra due chunk, quindi bufferizza
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n\n');
+            buffer = lines.pop();
 
             for (const line of lines) {
                 if (line.startsWith('data: ')) {
@@ -469,7 +473,7 @@ async function generate(params) {
 
                     // Aggiorna progresso
                     if (data.progress !== undefined) {
-                        updateProgress(data.progress, data.stage, data.eta);
+                        updateProgress(data.progress, data.stage, data.eta, data.tokens_per_sec);
                     }
 
                     // Se completato, mostra audio
@@ -501,13 +505,14 @@ async function generate(params) {
 }
 
 // Aggiorna UI progresso
-function updateProgress(percent, stage, eta) {
+function updateProgress(percent, stage, eta, tokensPerSec) {
     document.getElementById('progress-fill').style.width = `${percent}%`;
     document.getElementById('progress-percent').textContent = `${percent}%`;
     document.getElementById('loading-text').textContent = stage;
 
+    const speed = tokensPerSec ? ` (${tokensPerSec} token/s)` : '';
     if (eta > 0) {
-        document.getElementById('progress-eta').textContent = `Tempo stimato: ${eta}s`;
+        document.getElementById('progress-eta').textContent = `Tempo stimato: ${eta}s${speed}`;
     } else {
         document.getElementById('progress-eta').textContent = 'Completamento...';
     }
@@ -870,8 +875,13 @@ function insertTag(tag) {
 }
 
 function updateStatusBar(status) {
-    document.getElementById('model-status').textContent =
-        status.model_loaded ? `Modello: ${status.model_loaded}` : 'Nessun modello';
+    let modelText = status.model_loaded ? `Modello: ${status.model_loaded}` : 'Nessun modello';
+    if (status.ready === false) {
+        modelText = 'Warmup in corso...';
+    } else if (status.degraded) {
+        modelText += ' (warmup fallito)';
+    }
+    document.getElementById('model-status').textContent = modelText;
     document.getElementById('vram-status').textContent =
         `VRAM: ${status.vram_used_gb} GB`;
 }
@@ -933,13 +943,17 @@ async function createSmartPersonality() {
 
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        let buffer = '';
 
         while (true) {
             const { value, done } = await reader.read();
             if (done) break;
 
-            const chunk = decoder.decode(value);
-            const lines = chunk.split('\n\n');
+            // Gli eventi arrivano appena pubblicati: possono essere più di uno
+            // per chunk o spezzati tra due chunk, quindi bufferizza
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n\n');
+            buffer = lines.pop();
 
             for (const line of lines) {
                 if (line.startsWith('data: ')) {